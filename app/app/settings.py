@@ -51,16 +51,48 @@ INSTALLED_APPS = [
     'recipe',
 ]
 
+# Session, CSRF, auth and message middleware are skipped for API_PATH_PREFIX,
+# the API authenticates with tokens only
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.profiling.ProfilerMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+API_PATH_PREFIX = '/api/'
+
+# Opt-in request profiling, see core/profiling.py and /admin/profiles/
+PROFILER_ENABLED = bool(int(os.environ.get('PROFILER_ENABLED', 0)))
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+PROFILER_MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', 50))
+PROFILER_HEADER = 'X-Profile'
+PROFILER_TOKEN_MAX_AGE = 60 * 60
+
+# Log and aggregate queries slower than this, 0 turns it off, see
+# core/slow_queries.py and `manage.py slow_queries`
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN_INTERVAL = int(
+    os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', 300)
+)
+SLOW_QUERY_MAX_FINGERPRINTS = 200
+
+# Readiness checks, see core/health.py
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 1))
+HEALTH_CHECK_CACHE_SECONDS = float(
+    os.environ.get('HEALTH_CHECK_CACHE_SECONDS', 1)
+)
+
+# Serialized /api/user/me/ profiles, dropped when the user is saved
+USER_PROFILE_CACHE_SECONDS = int(
+    os.environ.get('USER_PROFILE_CACHE_SECONDS', 300)
+)
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -139,6 +171,47 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Uploaded recipe images are shrunk to fit this many pixels per side
+RECIPE_IMAGE_MAX_DIMENSION = int(
+    os.environ.get('RECIPE_IMAGE_MAX_DIMENSION', 2048)
+)
+
+# Media is stored under content hashes, locally or in an S3 compatible
+# bucket when MEDIA_STORAGE=s3 (e.g. MinIO, see docker-compose.yaml)
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'local')
+
+if MEDIA_STORAGE == 's3':
+    DEFAULT_FILE_STORAGE = 'core.storage_s3.ContentAddressedS3Storage'
+    AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
+    AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL') or None
+    AWS_S3_CUSTOM_DOMAIN = os.environ.get('AWS_S3_CUSTOM_DOMAIN') or None
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    AWS_QUERYSTRING_AUTH = False
+    AWS_S3_OBJECT_PARAMETERS = {
+        'CacheControl': 'public, max-age=31536000, immutable',
+    }
+else:
+    DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedFileSystemStorage'
+
+# Recipe exports hold private data, they live outside the media root and
+# are only served to their owner, then deleted EXPORT_TTL seconds later
+EXPORT_ROOT = os.environ.get('EXPORT_ROOT', '/vol/exports')
+EXPORT_TTL = int(os.environ.get('EXPORT_TTL', 24 * 60 * 60))
+
+# Uploaded images are streamed to disk and checked while they arrive, a
+# temp dir on the media volume makes storing them a rename, not a copy
+FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR')
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+
+# Hashed names plus precompressed .gz/.br copies, served by the proxy
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -147,12 +220,53 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Use Custom Model for Authentication
 AUTH_USER_MODEL = 'core.User'
 
+# Shared cache, throttle counters must be visible to every uWSGI worker
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Configure Django REST framework to generate openapi schema
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    # nginx passes X-Forwarded-For on untouched, throttle on REMOTE_ADDR
+    'NUM_PROXIES': 0,
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.environ.get('THROTTLE_RATE_READ', '600/min'),
+        'write': os.environ.get('THROTTLE_RATE_WRITE', '120/min'),
+        'upload_image': os.environ.get('THROTTLE_RATE_UPLOAD_IMAGE', '20/min'),
+        'token': os.environ.get('THROTTLE_RATE_TOKEN', '10/min'),
+    },
 }
 
 """ Allows upload of images through browser interface """
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+# Background jobs, see core/jobs.py
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_VISIBILITY_TIMEOUT', 300))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 10))
+
+# Deleting recipes or a user queues a media.gc job this many seconds out
+# that runs `manage.py gc_media`, later deletes join the queued one
+MEDIA_GC_DELAY = int(os.environ.get('MEDIA_GC_DELAY', 60 * 60))
+
+# Precomputed schema written by `manage.py build_schema`
+SCHEMA_ARTIFACT = os.environ.get('SCHEMA_ARTIFACT', BASE_DIR / 'schema.json')
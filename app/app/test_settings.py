@@ -0,0 +1,38 @@
+"""
+Django settings for running the test suite
+
+`manage.py test` uses this module unless DJANGO_SETTINGS_MODULE is set.
+Everything is inherited from app.settings, only what makes tests slow or
+leaks outside the test run is overridden.
+"""
+import atexit
+import shutil
+import tempfile
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import REST_FRAMEWORK
+
+# PBKDF2 is deliberately slow, tests only need passwords to round trip
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Keep uploads out of the real media volume
+MEDIA_ROOT = tempfile.mkdtemp(prefix='test-media-')
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+FILE_UPLOAD_TEMP_DIR = None
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedFileSystemStorage'
+
+# Per-process cache, never a shared Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Throttling has its own tests with patched rates, keep the rest clear
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        scope: '10000/min'
+        for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    },
+}
@@ -6,15 +6,25 @@ from django.conf import settings
 
 from core import views as core_views
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from drf_spectacular.views import SpectacularSwaggerView
 
 urlpatterns = [
+    path(
+        'admin/profiles/',
+        admin.site.admin_view(core_views.profile_list),
+        name='profile-list'),
+    path(
+        'admin/profiles/<str:profile_id>/',
+        admin.site.admin_view(core_views.profile_detail),
+        name='profile-detail'),
     path('admin/', admin.site.urls),
     path('api/health-check', core_views.health_check, name='health-check'),
-    path('api/schema', SpectacularAPIView.as_view(), name='api-schema'),
+    path('api/health/live', core_views.health_check, name='health-live'),
+    path(
+        'api/health/ready',
+        core_views.readiness_check,
+        name='health-ready'),
+    path('api/schema', core_views.SchemaView.as_view(), name='api-schema'),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'),
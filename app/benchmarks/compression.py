@@ -0,0 +1,85 @@
+"""
+Benchmark compression of recipe list payloads
+
+Renders recipe lists shaped like RecipeSerializer output and reports
+bytes on the wire and CPU time per response for each codec and level.
+
+    python -m benchmarks.compression --sizes 10 100 1000
+"""
+import argparse
+import gzip
+import os
+import time
+from decimal import Decimal
+
+import django
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def recipe_payload(count):
+    """ Build a list response like GET /api/recipe/recipes/ """
+    return [
+        {
+            'id': i,
+            'title': f'Sample Recipe Title {i}',
+            'time_minutes': 10 + i % 50,
+            'price': Decimal('5.50') + i % 20,
+            'link': f'https://example.com/recipes/{i}.pdf',
+            'tags': [
+                {'id': t, 'name': name}
+                for t, name in enumerate(['Dinner', 'Vegan', 'Quick'][:i % 4])
+            ],
+            'ingredients': [
+                {'id': n, 'name': name}
+                for n, name in enumerate(
+                    ['Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion'][:i % 6]
+                )
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def codecs():
+    yield 'gzip-1', lambda data: gzip.compress(data, 1)
+    yield 'gzip-5', lambda data: gzip.compress(data, 5)
+    yield 'gzip-9', lambda data: gzip.compress(data, 9)
+    if brotli is not None:
+        yield 'br-4', lambda data: brotli.compress(data, quality=4)
+        yield 'br-11', lambda data: brotli.compress(data, quality=11)
+
+
+def measure(compress, data, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        compressed = compress(data)
+    return len(compressed), (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+
+    print(f'{"recipes":>8} {"codec":<8}{"bytes":>10}{"ratio":>8}{"cpu ms":>9}')
+    for size in args.sizes:
+        data = JSONRenderer().render(recipe_payload(size))
+        print(f'{size:>8} {"none":<8}{len(data):>10}{1:>8.2f}{0:>9.3f}')
+        for name, compress in codecs():
+            length, cpu_ms = measure(compress, data, args.repeat)
+            print(f'{size:>8} {name:<8}{length:>10}'
+                  f'{length / len(data):>8.2f}{cpu_ms:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
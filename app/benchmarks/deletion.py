@@ -0,0 +1,123 @@
+"""
+Benchmark deleting a user with many recipes
+
+Seeds a user with N recipes, each with two tags and five ingredients,
+straight in SQL, then deletes the user through the ORM cascade or the
+chunked deletes of core/deletion.py. Each strategy runs in its own
+process so peak memory is reported separately. Needs a database, the
+benchmark only touches its own bench-*@example.com users.
+
+    python -m benchmarks.deletion --recipes 100000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+import django
+
+STRATEGIES = ['orm', 'chunked']
+
+
+def seed(recipes):
+    """ Create a user owning `recipes` recipes, return the user """
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    from core.models import CatalogName, Ingredient, Recipe, Tag
+
+    user = get_user_model().objects.create_user(
+        email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+        password='bench',
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        catalog = CatalogName._meta.db_table
+        cursor.execute(f"""
+            INSERT INTO {catalog} (name, key)
+            SELECT 'bench ' || n, 'bench ' || n
+            FROM generate_series(1, 200) AS n
+            ON CONFLICT (name) DO NOTHING
+        """)
+        for model, count in [(Tag, 50), (Ingredient, 200)]:
+            cursor.execute(f"""
+                INSERT INTO {model._meta.db_table} (
+                    user_id, catalog_id, updated_at, change_seq
+                )
+                SELECT %s, c.id, now(), 0
+                FROM generate_series(1, %s) AS n
+                JOIN {catalog} c ON c.name = 'bench ' || n
+            """, [user.pk, count])
+        cursor.execute(f"""
+            INSERT INTO {Recipe._meta.db_table} (
+                user_id, title, description, time_minutes, price, link,
+                minhash_bands, version, updated_at, change_seq
+            )
+            SELECT %s, 'Recipe ' || n, '', 10 + n %% 50, 1 + n %% 40, '',
+                   '{{}}', 1, now(), 0
+            FROM generate_series(1, %s) AS n
+        """, [user.pk, recipes])
+        for through, columns, model, per_recipe in [
+            (Recipe.tags.through, 'tag_id', Tag, 2),
+            (Recipe.ingredients.through, 'ingredient_id, unit', Ingredient, 5),
+        ]:
+            values = 'o.id' if ',' not in columns else "o.id, 'g'"
+            cursor.execute(f"""
+                INSERT INTO {through._meta.db_table} (recipe_id, {columns})
+                SELECT r.id, {values}
+                FROM {Recipe._meta.db_table} r
+                CROSS JOIN LATERAL (
+                    SELECT id FROM {model._meta.db_table}
+                    WHERE user_id = %s
+                    ORDER BY (id + r.id) %% 97
+                    LIMIT %s
+                ) o
+                WHERE r.user_id = %s
+            """, [user.pk, per_recipe, user.pk])
+
+    return user
+
+
+def run(strategy, recipes):
+    """ Seed, delete with one strategy, print seconds and peak memory """
+    from core import deletion
+
+    user = seed(recipes)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if strategy == 'orm':
+        user.delete()
+    else:
+        deletion.delete_user(user)
+    elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print(f'{strategy:8} {elapsed:8.2f} s  {peak / 1024:8.1f} MB peak')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--strategy', choices=STRATEGIES)
+    args = parser.parse_args()
+
+    if args.strategy is None:
+        print(f'deleting a user with {args.recipes} recipes')
+        for strategy in STRATEGIES:
+            subprocess.run([
+                sys.executable, '-m', 'benchmarks.deletion',
+                '--recipes', str(args.recipes),
+                '--strategy', strategy,
+            ], check=True)
+        return
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+    run(args.strategy, args.recipes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark the candidate set of the similar recipes lookup
+
+Builds recipes as variations of a few base dishes, two tags and five
+ingredients each with some of them swapped, signs them with
+core.similarity and cuts the signatures into bands for several layouts.
+For each layout reports the average number of candidates a lookup has to
+score, and how many of the recipes at or above --threshold Jaccard
+similarity are among them. Needs no database.
+
+    python -m benchmarks.similarity --recipes 20000 --threshold 0.5
+"""
+import argparse
+import random
+from collections import defaultdict
+
+from core import similarity
+
+LAYOUTS = [(32, 2), (16, 4), (8, 8)]
+
+
+def recipes(count, rng):
+    """ Feature sets of `count` recipes, ten variations per base dish """
+    tags = range(50)
+    ingredients = range(200)
+    dishes = [
+        (rng.sample(tags, 2), rng.sample(ingredients, 5))
+        for _ in range(max(1, count // 10))
+    ]
+
+    result = []
+    for _ in range(count):
+        tag_ids, ingredient_ids = rng.choice(dishes)
+        tag_ids, ingredient_ids = list(tag_ids), list(ingredient_ids)
+        for _ in range(rng.randint(0, 4)):
+            ingredient_ids[rng.randrange(5)] = rng.choice(ingredients)
+        result.append(similarity.features(tag_ids, ingredient_ids))
+
+    return result
+
+
+def band_hashes(sig, bands, rows):
+    """ Like similarity.bands, with the layout passed in """
+    return [
+        (band, tuple(sig[band * rows:(band + 1) * rows]))
+        for band in range(bands)
+    ]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    feature_sets = recipes(args.recipes, rng)
+    signatures = [similarity.signature(f) for f in feature_sets]
+    queries = rng.sample(range(args.recipes), args.queries)
+    wanted = {
+        q: {
+            pk for pk, features in enumerate(feature_sets)
+            if pk != q
+            and jaccard(feature_sets[q], features) >= args.threshold
+        }
+        for q in queries
+    }
+
+    print(f'{args.recipes} recipes, {args.queries} lookups, '
+          f'recall at similarity >= {args.threshold}')
+    print(f'{"layout":<8}{"candidates":>12}{"scanned":>9}{"recall":>8}')
+    for bands, rows in LAYOUTS:
+        index = defaultdict(set)
+        for pk, sig in enumerate(signatures):
+            for key in band_hashes(sig, bands, rows):
+                index[key].add(pk)
+
+        candidates = found = total = 0
+        for q in queries:
+            matches = set().union(*(
+                index[key] for key in band_hashes(signatures[q], bands, rows)
+            )) - {q}
+            candidates += len(matches)
+            found += len(matches & wanted[q])
+            total += len(wanted[q])
+
+        average = candidates / len(queries)
+        print(f'{bands}x{rows:<6}{average:>12.1f}'
+              f'{average / args.recipes:>9.1%}'
+              f'{found / total if total else 1:>8.1%}')
+
+
+if __name__ == '__main__':
+    main()
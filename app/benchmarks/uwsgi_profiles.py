@@ -0,0 +1,148 @@
+"""
+Benchmark uWSGI serving profiles
+
+Starts uWSGI once per SERVE_PROFILE preset, drives it with concurrent
+HTTP requests and reports throughput plus worker memory (RSS and PSS,
+PSS splits copy-on-write pages shared with the master fairly).
+
+    python -m benchmarks.uwsgi_profiles --duration 10 --concurrency 16
+"""
+import argparse
+import os
+import signal
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+
+SCRIPTS_DIRS = [
+    os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'),
+    '/scripts',
+]
+PROFILES = ['small', 'balanced', 'throughput']
+
+
+def scripts_dir():
+    """ The directory holding uwsgi.ini, in the checkout or the image """
+    for path in SCRIPTS_DIRS:
+        if os.path.exists(os.path.join(path, 'uwsgi.ini')):
+            return path
+    raise RuntimeError(
+        f'uwsgi.ini not found in any of {", ".join(SCRIPTS_DIRS)}'
+    )
+
+
+def process_tree(pid):
+    """ Return pid and all of its descendants """
+    pids = [pid]
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{tid}/children') as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_kb(pid, field):
+    """ Read a memory field in kB from smaps_rollup """
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(f'{field}:'):
+                return int(line.split()[1])
+    return 0
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not become ready')
+
+
+def load(url, headers, duration, concurrency):
+    """ Hammer url from several threads, return (requests, errors) """
+    counts = {'ok': 0, 'error': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        ok = error = 0
+        while time.monotonic() < deadline:
+            try:
+                request = urllib.request.Request(url, headers=headers)
+                urllib.request.urlopen(request, timeout=10).read()
+                ok += 1
+            except (urllib.error.URLError, ConnectionError):
+                error += 1
+        with lock:
+            counts['ok'] += ok
+            counts['error'] += error
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['ok'], counts['error']
+
+
+def run_profile(profile, args):
+    env = dict(os.environ, SERVE_PROFILE=profile, SERVE_SOCKET='127.0.0.1:0')
+    scripts = scripts_dir()
+    command = (
+        f'. {scripts}/uwsgi-profile.sh && exec uwsgi '
+        f'--ini {scripts}/uwsgi.ini --http-socket 127.0.0.1:{args.port}'
+    )
+    server = subprocess.Popen(
+        ['sh', '-c', command], env=env, stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{args.port}{args.path}'
+    headers = {'Authorization': f'Token {args.token}'} if args.token else {}
+    try:
+        wait_until_ready(url)
+        """ warm every worker before measuring """
+        load(url, headers, 2, args.concurrency)
+        requests, errors = load(url, headers, args.duration, args.concurrency)
+        pids = process_tree(server.pid)
+        rss = sum(memory_kb(pid, 'Rss') for pid in pids)
+        pss = sum(memory_kb(pid, 'Pss') for pid in pids)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    return {
+        'profile': profile,
+        'processes': len(pids),
+        'req_per_s': requests / args.duration,
+        'errors': errors,
+        'rss_mb': rss / 1024,
+        'pss_mb': pss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--path', default='/api/health-check')
+    parser.add_argument('--token', help='API token for authenticated paths')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--profiles', nargs='+', default=PROFILES)
+    args = parser.parse_args()
+
+    print(f'{"profile":<12}{"procs":>6}{"req/s":>10}{"errors":>8}'
+          f'{"RSS MB":>10}{"PSS MB":>10}')
+    for profile in args.profiles:
+        result = run_profile(profile, args)
+        print(f'{result["profile"]:<12}{result["processes"]:>6}'
+              f'{result["req_per_s"]:>10.1f}{result["errors"]:>8}'
+              f'{result["rss_mb"]:>10.1f}{result["pss_mb"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
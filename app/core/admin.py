@@ -49,8 +49,17 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class CatalogNamedAdmin(admin.ModelAdmin):
+    """Tags and ingredients are named by a shared catalog entry"""
+
+    list_display = ["name", "user"]
+    list_select_related = ["catalog", "user"]
+    raw_id_fields = ["catalog", "user"]
+
+
 """Force it use UserAdmin"""
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Tag, CatalogNamedAdmin)
+admin.site.register(models.Ingredient, CatalogNamedAdmin)
+admin.site.register(models.CatalogName)
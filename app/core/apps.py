@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        """ Register signal handlers and background job handlers """
+        from core import signals  # noqa: F401
+        from core import jobs
+
+        jobs.autodiscover()
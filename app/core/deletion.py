@@ -0,0 +1,152 @@
+"""
+Chunked deletion of recipes and users
+
+Deleting through the ORM loads every recipe, tag and link row, sends
+signals for each and runs the cascade in one long transaction. These
+functions delete with plain SQL, `chunk_size` recipes per transaction,
+doing the bookkeeping the signal handlers would: tombstones for the
+change feed and RecipeStats deltas. delete_user also prunes the catalog
+names nobody uses any more. Image files are left to `manage.py
+gc_media`. They run from background jobs, see recipe/jobs.py and
+user/jobs.py, which pass `on_chunk` to extend the job's lease after
+every chunk and then schedule a media.gc job for the orphaned images.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+
+from core.models import (
+    CatalogName,
+    Ingredient,
+    Recipe,
+    RecipeStats,
+    Tag,
+    Tombstone,
+    lock_changes,
+)
+
+CHUNK_SIZE = 1000
+
+
+def delete_recipe_chunk(user_id, recipe_ids=None, chunk_size=CHUNK_SIZE,
+                        record=True):
+    """
+    Delete up to `chunk_size` of the user's recipes, limited to
+    `recipe_ids` if given, return how many went. With `record` tombstones
+    and statistics are kept, skip both when the user goes too.
+    """
+    recipe_table = Recipe._meta.db_table
+    tags_table = Recipe.tags.through._meta.db_table
+    amounts_table = Recipe.ingredients.through._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        """
+        change lock before row locks, the order save() and duplicate()
+        take them in, or a concurrent save deadlocks with the chunk
+        """
+        lock_changes(cursor, user_id)
+        cursor.execute(f"""
+            SELECT id FROM {recipe_table}
+            WHERE user_id = %s
+              AND (%s::bigint[] IS NULL OR id = ANY(%s::bigint[]))
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE
+        """, [user_id, recipe_ids, recipe_ids, chunk_size])
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+
+        cursor.execute(f"""
+            DELETE FROM {tags_table} WHERE recipe_id = ANY(%s)
+            RETURNING tag_id
+        """, [ids])
+        tag_counts = Counter(row[0] for row in cursor.fetchall())
+        cursor.execute(
+            f'DELETE FROM {amounts_table} WHERE recipe_id = ANY(%s)',
+            [ids],
+        )
+        cursor.execute(f"""
+            DELETE FROM {recipe_table} WHERE id = ANY(%s)
+            RETURNING time_minutes, price
+        """, [ids])
+        rows = cursor.fetchall()
+
+        if record:
+            cursor.execute(f"""
+                INSERT INTO {Tombstone._meta.db_table} (
+                    user_id, kind, object_id, change_seq, deleted_at
+                )
+                SELECT %s, %s, id, nextval('core_change_seq'), now()
+                FROM unnest(%s::bigint[]) AS deleted(id)
+            """, [user_id, Tombstone.RECIPE, ids])
+            RecipeStats.objects.apply(
+                user_id,
+                removed=[(row[0], row[1]) for row in rows],
+                tags={tag_id: -n for tag_id, n in tag_counts.items()},
+            )
+
+    return len(ids)
+
+
+def delete_recipes(user_id, recipe_ids=None, chunk_size=CHUNK_SIZE,
+                   record=True, on_chunk=None):
+    """
+    Delete the user's recipes chunk by chunk, return how many. `on_chunk`
+    is called after each chunk.
+    """
+    deleted = 0
+    while True:
+        count = delete_recipe_chunk(user_id, recipe_ids, chunk_size, record)
+        if not count:
+            return deleted
+        deleted += count
+        if on_chunk is not None:
+            on_chunk()
+
+
+def delete_rows(model, user_id, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """ Delete a user's rows of a model without dependents, in chunks """
+    table = model._meta.db_table
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM {table} WHERE user_id = %s LIMIT %s
+                )
+            """, [user_id, chunk_size])
+            if not cursor.rowcount:
+                return deleted
+            deleted += cursor.rowcount
+        if on_chunk is not None:
+            on_chunk()
+
+
+def delete_user(user, chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Delete a user and everything they own. The bulky tables go first in
+    chunks, the ORM then deletes the user with the few rows left.
+    """
+    catalog_ids = [
+        *Tag.objects.filter(user=user).values_list('catalog_id', flat=True),
+        *Ingredient.objects.filter(user=user).values_list(
+            'catalog_id', flat=True,
+        ),
+    ]
+    deleted = {
+        'recipes': delete_recipes(user.pk, chunk_size=chunk_size,
+                                  record=False, on_chunk=on_chunk),
+    }
+    """ links went with the recipes, tags are never shared between users """
+    for key, model in [
+        ('tags', Tag),
+        ('ingredients', Ingredient),
+        ('tombstones', Tombstone),
+    ]:
+        deleted[key] = delete_rows(model, user.pk, chunk_size, on_chunk)
+    user.delete()
+    """ the shared names only this user had go with them """
+    deleted['names'] = CatalogName.objects.prune(catalog_ids)
+
+    return deleted
@@ -0,0 +1,119 @@
+"""
+Readiness checks
+
+Each dependency the API needs, the database, the shared cache and the
+media storage, is probed on its own thread with HEALTH_CHECK_TIMEOUT to
+answer, so one hung dependency fails the check instead of the request.
+Results are kept in process for HEALTH_CHECK_CACHE_SECONDS and computed
+by a single request at a time, a load balancer polling every worker
+cannot pile probes onto a struggling database.
+"""
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+PROBE_PREFIX = 'health'
+
+executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='health')
+lock = threading.Lock()
+last = {'at': None, 'result': None}
+
+
+def check_database():
+    """
+    Open a connection and round trip a statement, both bounded by the
+    timeout so a hung database cannot hold a probe thread
+    """
+    timeout = settings.HEALTH_CHECK_TIMEOUT
+    wrapper = connections['default']
+    params = wrapper.get_connection_params()
+    """ libpq takes whole seconds """
+    params['connect_timeout'] = max(1, math.ceil(timeout))
+    params['options'] = ' '.join(filter(None, [
+        params.get('options'),
+        f'-c statement_timeout={int(timeout * 1000)}',
+    ]))
+
+    """ a connection of its own, probe threads are reused """
+    connection = wrapper.get_new_connection(params)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    finally:
+        connection.close()
+
+
+def check_cache():
+    """ Write and read back a short lived key """
+    key = f'{PROBE_PREFIX}:{uuid.uuid4().hex}'
+    cache.set(key, 1, 10)
+    if cache.get(key) != 1:
+        raise RuntimeError('cache did not return the probe value')
+    cache.delete(key)
+
+
+def check_media():
+    """ Write and delete a file through the media storage """
+    name = default_storage.save(
+        f'{PROBE_PREFIX}/{uuid.uuid4().hex}.probe',
+        ContentFile(uuid.uuid4().bytes),
+    )
+    default_storage.delete(name)
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'media': check_media,
+}
+
+
+def timed(check):
+    start = time.perf_counter()
+    check()
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def run_checks():
+    """ Run every check concurrently, return (ready, per check results) """
+    timeout = settings.HEALTH_CHECK_TIMEOUT
+    futures = {
+        name: executor.submit(timed, check)
+        for name, check in CHECKS.items()
+    }
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            results[name] = {
+                'ok': False,
+                'error': f'timed out after {timeout}s',
+            }
+        elif future.exception() is not None:
+            results[name] = {'ok': False, 'error': str(future.exception())}
+        else:
+            results[name] = {'ok': True, 'ms': future.result()}
+
+    return all(r['ok'] for r in results.values()), results
+
+
+def readiness():
+    """ Cached run_checks(), only one caller refreshes it at a time """
+    with lock:
+        now = time.monotonic()
+        if (last['at'] is None
+                or now - last['at'] >= settings.HEALTH_CHECK_CACHE_SECONDS):
+            last['result'] = run_checks()
+            last['at'] = time.monotonic()
+        return last['result']
@@ -0,0 +1,159 @@
+"""
+Background jobs backed by the database
+
+Jobs are rows in core_job. Workers claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes can
+poll the same table without handing out a job twice. A claimed job is
+invisible to other workers until its visibility timeout passes, after
+which a crashed worker's job is picked up again, unless it has used up
+its attempts. Long handlers call heartbeat() between steps to keep the
+job to themselves.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import Job
+from core.slow_queries import slow_query_log
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(name):
+    """ Register a function as the handler for jobs called `name` """
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def autodiscover():
+    """ Import the `jobs` module of every installed app """
+    autodiscover_modules('jobs')
+
+
+def enqueue(name, user=None, max_attempts=3, run_after=None, **payload):
+    """
+    Queue a job, it becomes visible to workers on commit, and not before
+    `run_after` when given
+    """
+    return Job.objects.create(
+        name=name,
+        user=user,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def schedule(name, delay, **payload):
+    """
+    Queue a job `delay` seconds from now unless one of the same name is
+    already waiting, a burst of callers shares the one run
+    """
+    if Job.objects.filter(name=name, status=Job.QUEUED).exists():
+        return None
+    return enqueue(
+        name,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        **payload,
+    )
+
+
+def lease_end():
+    """ When a job claimed or extended now becomes visible again """
+    return timezone.now() + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+
+
+def claim(batch=1):
+    """ Lock and mark up to `batch` ready jobs as running """
+    now = timezone.now()
+    expired = Q(status=Job.RUNNING, locked_until__lt=now)
+    with transaction.atomic():
+        """
+        a job whose worker died on every attempt, e.g. killed for memory,
+        would otherwise be handed out forever
+        """
+        Job.objects.filter(
+            expired,
+            attempts__gte=F('max_attempts'),
+        ).update(
+            status=Job.FAILED,
+            locked_until=None,
+            last_error='Worker lost on the last attempt',
+            updated_at=now,
+        )
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Job.QUEUED, run_after__lte=now)
+                | (expired & Q(attempts__lt=F('max_attempts')))
+            ).order_by('run_after')[:batch]
+        )
+        locked_until = lease_end()
+        for claimed in jobs:
+            claimed.status = Job.RUNNING
+            claimed.attempts += 1
+            claimed.locked_until = locked_until
+            claimed.save(update_fields=[
+                'status', 'attempts', 'locked_until', 'updated_at',
+            ])
+
+    return jobs
+
+
+def heartbeat(claimed):
+    """ Extend a running job's lease, call between steps of long jobs """
+    claimed.locked_until = lease_end()
+    Job.objects.filter(pk=claimed.pk, status=Job.RUNNING).update(
+        locked_until=claimed.locked_until,
+    )
+
+
+def run(claimed):
+    """ Run a claimed job, then record success, a retry or failure """
+    handler = registry.get(claimed.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for {claimed.name}')
+        with slow_query_log(f'job:{claimed.name}'):
+            result = handler(claimed)
+    except Exception:
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            """ exponential backoff before the next attempt """
+            delay = settings.JOB_RETRY_DELAY * 2 ** (claimed.attempts - 1)
+            claimed.status = Job.QUEUED
+            claimed.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            claimed.status = Job.FAILED
+        logger.warning('Job %s failed (attempt %s)', claimed, claimed.attempts)
+    else:
+        claimed.status = Job.DONE
+        claimed.result = result
+
+    claimed.locked_until = None
+    claimed.save(update_fields=[
+        'status', 'result', 'last_error', 'run_after', 'locked_until',
+        'updated_at',
+    ])
+    return claimed
+
+
+def run_pending(batch=1):
+    """ Claim and run jobs until none are ready, return how many ran """
+    count = 0
+    while True:
+        jobs = claim(batch)
+        if not jobs:
+            return count
+        for claimed in jobs:
+            run(claimed)
+        count += len(jobs)
@@ -0,0 +1,109 @@
+"""
+Django command to prepare the app before serving requests
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from core import storage
+
+""" pg_advisory_lock key shared by every replica running migrations """
+MIGRATION_LOCK_ID = 7261946
+
+
+def static_source_hash():
+    """
+    Hash every file collectstatic would copy, and what it writes them
+    with, a new storage or brotli showing up changes the output too
+    """
+    digest = hashlib.sha256()
+    digest.update(settings.STATICFILES_STORAGE.encode())
+    digest.update(b'brotli' if storage.brotli is not None else b'')
+    found = []
+    for finder in get_finders():
+        for path, source in finder.list([]):
+            found.append((path, source.path(path)))
+
+    for path, full_path in sorted(found):
+        digest.update(path.encode())
+        with open(full_path, 'rb') as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+def pending_migrations():
+    """ Return the unapplied migration plan """
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+class Command(BaseCommand):
+    """ Bootstrap Command """
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        total = time.monotonic()
+        self._phase('directories', self.make_directories)
+        self._phase('wait_for_db', lambda: call_command('wait_for_db'))
+        self._phase('collectstatic', self.collect_static)
+        self._phase('migrate', self.migrate)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Bootstrap complete in {time.monotonic() - total:.2f}s'
+        ))
+
+    def _phase(self, name, func):
+        """ Run a phase and report how long it took """
+        start = time.monotonic()
+        func()
+        self.stdout.write(f'Phase {name}: {time.monotonic() - start:.2f}s')
+
+    def make_directories(self):
+        """
+        Create the upload temp dir, it sits on a volume that existed
+        before the image made it, so the volume may not have it
+        """
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+
+    def collect_static(self):
+        """ Skip collectstatic when the static sources are unchanged """
+        marker = os.path.join(settings.STATIC_ROOT, '.source-hash')
+        source_hash = static_source_hash()
+        try:
+            with open(marker) as f:
+                if f.read() == source_hash:
+                    self.stdout.write('Static files unchanged, skipping')
+                    return
+        except OSError:
+            pass
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(marker, 'w') as f:
+            f.write(source_hash)
+
+    def migrate(self):
+        """ Migrate only when needed, one replica at a time """
+        if not pending_migrations():
+            self.stdout.write('No migrations to apply, skipping')
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [MIGRATION_LOCK_ID])
+        try:
+            """ another replica may have migrated while we waited """
+            if pending_migrations():
+                call_command('migrate', interactive=False)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s)', [MIGRATION_LOCK_ID]
+                )
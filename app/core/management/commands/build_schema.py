@@ -0,0 +1,27 @@
+"""
+Django command to precompute the OpenAPI schema
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import write_schema_artifact
+
+
+class Command(BaseCommand):
+    """ Build Schema Command """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=settings.SCHEMA_ARTIFACT,
+            help='Where to write the schema artifact',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        artifact = write_schema_artifact(options['file'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema written to {options['file']} "
+            f"(fingerprint {artifact['fingerprint'][:12]})"
+        ))
@@ -0,0 +1,80 @@
+"""
+Django command to delete media files no row refers to, deleting recipes
+or a user queues it as the media.gc job, see recipe/jobs.py
+"""
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.storage import file_fields, file_references
+
+
+def walk(storage, path):
+    """ Yield every file name below `path` """
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    """ Media Garbage Collection Command """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='uploads',
+            help='Only collect files below this directory',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=24 * 60 * 60,
+            help='Keep orphans modified within this many seconds',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report orphans without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        storage = default_storage
+        if not storage.exists(options['prefix']):
+            self.stdout.write('Nothing to collect')
+            return
+
+        referenced = set()
+        for model, field in file_fields():
+            referenced.update(
+                model._default_manager.exclude(
+                    **{f'{field.name}__isnull': True},
+                ).values_list(field.name, flat=True).distinct().iterator()
+            )
+
+        """ uploads in flight are saved before the row that refers to them """
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        deleted = 0
+        for name in walk(storage, options['prefix']):
+            if name in referenced or file_references(name):
+                continue
+            """
+            last, right before deleting, an upload of the same content
+            touches the file before its row is written
+            """
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            if not options['dry_run']:
+                storage.delete(name)
+            deleted += 1
+            self.stdout.write(name, self.style.NOTICE)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} orphaned files'
+        ))
@@ -0,0 +1,132 @@
+"""
+Django command to run background job workers
+"""
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+logger = logging.getLogger(__name__)
+
+""" longest pause between polls while the database keeps failing """
+MAX_BACKOFF = 30
+
+
+class Command(BaseCommand):
+    """ Run Workers Command """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=1,
+            help='Jobs claimed per poll',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['processes'] == 1:
+            self.work(options)
+            return
+
+        """ children must open their own database connections """
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            self.spawn(context, options)
+            for _ in range(options['processes'])
+        ]
+
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+            for worker in workers:
+                worker.terminate()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        """ replace children that die, burst children exit on purpose """
+        while not options['burst'] and not stopping:
+            multiprocessing.connection.wait(
+                [worker.sentinel for worker in workers],
+                timeout=1,
+            )
+            for i, worker in enumerate(workers):
+                if worker.exitcode is None or stopping:
+                    continue
+                logger.error(
+                    'Worker %s exited with %s, starting another',
+                    worker.pid, worker.exitcode,
+                )
+                time.sleep(options['poll_interval'])
+                workers[i] = self.spawn(context, options)
+
+        for worker in workers:
+            worker.join()
+
+    def spawn(self, context, options):
+        """ Start one worker process """
+        worker = context.Process(target=self.work, args=(options,))
+        worker.start()
+        return worker
+
+    def work(self, options):
+        """ Poll for jobs until told to stop """
+        stopping = []
+
+        def stop(signum, frame):
+            """ finish the current job, then exit """
+            stopping.append(signum)
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'Worker {os.getpid()} started')
+
+        backoff = options['poll_interval']
+        while not stopping:
+            try:
+                claimed = jobs.claim(options['batch'])
+                for job in claimed:
+                    jobs.run(job)
+            except Exception:
+                """
+                e.g. the database restarting, a job left running is
+                claimed again once its lease expires
+                """
+                logger.exception('Worker %s failed to poll', os.getpid())
+                connections.close_all()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            backoff = options['poll_interval']
+            if claimed:
+                continue
+            if options['burst']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'Worker {os.getpid()} stopped')
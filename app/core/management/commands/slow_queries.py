@@ -0,0 +1,56 @@
+"""
+Django command to print the slow query report
+"""
+from django.core.management.base import BaseCommand
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    """ Slow Query Report Command """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Show this many fingerprints, most total time first',
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Include the sampled EXPLAIN (ANALYZE, BUFFERS) plans',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Forget the recorded queries after printing them',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        entries = slow_queries.report()[:options['limit']]
+        if not entries:
+            self.stdout.write('No slow queries recorded')
+
+        for entry in entries:
+            self.stdout.write(self.style.NOTICE(
+                f"[{entry['fingerprint']}] {entry['count']}x "
+                f"total {entry['total_ms']:.1f}ms "
+                f"max {entry['max_ms']:.1f}ms"
+            ))
+            origins = sorted(
+                entry['origins'].items(),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+            self.stdout.write('  from ' + ', '.join(
+                f'{origin} ({count})' for origin, count in origins
+            ))
+            self.stdout.write(f"  {entry['sql']}")
+            if options['explain'] and entry['explain']:
+                for line in entry['explain'].splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if options['reset']:
+            slow_queries.reset()
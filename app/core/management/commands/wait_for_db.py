@@ -6,23 +6,46 @@ import time
 from psycopg2 import OperationalError as Psycopg2Error
 
 
+from django.db import connections
 from django.db.utils import OperationalError  # django error when db not ready
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """ Wait Command """
+    initial_delay = 0.1
+    max_delay = 5
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=None,
+            help='Give up after this many seconds (default: wait forever)',
+        )
+
+    def probe(self):
+        """ Open a connection, cheaper than running the system checks """
+        connections['default'].ensure_connection()
 
     def handle(self, *args, **options):
         """Entrypoint for command"""
         self.stdout.write('Waiting for database....')
-        db_up = False
-        while db_up is False:
+        start = time.monotonic()
+        delay = self.initial_delay
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe()
+                break
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second....')
-                time.sleep(1)
+                timeout = options['timeout']
+                if timeout and time.monotonic() - start + delay > timeout:
+                    raise CommandError('Database unavailable, giving up')
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:g} seconds....'
+                )
+                time.sleep(delay)
+                """ exponential backoff, capped """
+                delay = min(delay * 2, self.max_delay)
 
         self.stdout.write(self.style.SUCCESS('Database Available'))
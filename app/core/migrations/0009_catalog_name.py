@@ -0,0 +1,63 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalize_name(name):
+    return ' '.join(name.split()).casefold()
+
+
+def link_catalog(apps, schema_editor):
+    """ Intern every existing tag and ingredient name """
+    CatalogName = apps.get_model('core', 'CatalogName')
+    for model_name in ['Tag', 'Ingredient']:
+        model = apps.get_model('core', model_name)
+        names = model.objects.values_list('name', flat=True).distinct()
+        for name in names.iterator():
+            entry, created = CatalogName.objects.get_or_create(
+                key=normalize_name(name),
+                defaults={'name': ' '.join(name.split())},
+            )
+            model.objects.filter(name=name).update(catalog=entry)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='catalogname',
+            index=models.Index(fields=['key'], name='catalog_key_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.catalogname'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.catalogname'),
+        ),
+        migrations.RunPython(link_catalog, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'catalog'], name='ingredient_user_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'catalog'], name='tag_user_catalog_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_ingredient_amounts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('image__isnull', False)), fields=['image'], name='recipe_image_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:00
+
+import hashlib
+import random
+import struct
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+""" frozen copy of core.similarity as it was when this migration ran """
+SIGNATURE_SIZE = 64
+BANDS = 32
+ROWS = SIGNATURE_SIZE // BANDS
+PRIME = 2 ** 31 - 1
+_rng = random.Random(0x5EED)
+HASH_PARAMS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(0, PRIME))
+    for _ in range(SIGNATURE_SIZE)
+]
+
+
+def signature(tag_ids, ingredient_ids):
+    """ MinHash signature of the links, None without any """
+    feature_set = (
+        {2 * pk for pk in tag_ids} | {2 * pk + 1 for pk in ingredient_ids}
+    )
+    if not feature_set:
+        return None
+
+    return [
+        min((a * x + b) % PRIME for x in feature_set)
+        for a, b in HASH_PARAMS
+    ]
+
+
+def bands(sig):
+    """ Signed 64 bit hash of each band, empty without a signature """
+    if sig is None:
+        return []
+
+    hashes = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f'>{ROWS + 1}I', band, *rows),
+            digest_size=8,
+        ).digest()
+        hashes.append(int.from_bytes(digest, 'big', signed=True))
+
+    return hashes
+
+
+def compute_signatures(apps, schema_editor):
+    """ Sign every existing recipe, a thousand at a time """
+    Recipe = apps.get_model('core', 'Recipe')
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        tags = {pk: set() for pk in chunk}
+        ingredients = {pk: set() for pk in chunk}
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=chunk,
+        ).values_list('recipe_id', 'tag_id'):
+            tags[recipe_id].add(tag_id)
+        for recipe_id, ingredient_id in Recipe.ingredients.through.objects.filter(
+            recipe_id__in=chunk,
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+
+        recipes = []
+        for pk in chunk:
+            sig = signature(tags[pk], ingredients[pk])
+            recipes.append(Recipe(pk=pk, minhash=sig, minhash_bands=bands(sig)))
+        Recipe.objects.bulk_update(recipes, ['minhash', 'minhash_bands'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_image_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='minhash',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, editable=False, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='minhash_bands',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['minhash_bands'], name='recipe_minhash_bands_idx'),
+        ),
+        migrations.RunPython(compute_signatures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:07
+
+import core.models
+from decimal import Decimal
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_existing(apps, schema_editor):
+    """ Start every user's statistics from their current recipes """
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    buckets = core.models.RecipeStats.PRICE_BUCKETS
+    bounds = [None, *buckets, None]
+
+    histogram = {
+        f'bucket_{i}': models.Count('id', filter=models.Q(
+            **({'price__gte': low} if low is not None else {}),
+            **({'price__lt': high} if high is not None else {}),
+        ))
+        for i, (low, high) in enumerate(zip(bounds, bounds[1:]))
+    }
+    totals = Recipe.objects.values('user_id').annotate(
+        recipe_count=models.Count('id'),
+        time_minutes_total=models.Sum('time_minutes'),
+        price_total=models.Sum('price'),
+        **histogram,
+    ).order_by()
+
+    tag_links = Recipe.tags.through.objects.values(
+        'recipe__user_id', 'tag_id',
+    ).annotate(count=models.Count('id')).order_by()
+    tag_counts = {}
+    for link in tag_links.iterator():
+        tag_counts.setdefault(link['recipe__user_id'], {})[
+            str(link['tag_id'])
+        ] = link['count']
+
+    RecipeStats.objects.bulk_create([
+        RecipeStats(
+            user_id=row['user_id'],
+            recipe_count=row['recipe_count'],
+            time_minutes_total=row['time_minutes_total'],
+            price_total=row['price_total'],
+            price_histogram=[row[key] for key in histogram],
+            tag_counts=tag_counts.get(row['user_id'], {}),
+        )
+        for row in totals.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_ingredient_cover_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('price_histogram', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=core.models.empty_price_histogram, size=None)),
+                ('tag_counts', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
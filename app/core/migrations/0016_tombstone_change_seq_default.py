@@ -0,0 +1,18 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.0.10 on 2026-10-19 16:00
+
+import hashlib
+import struct
+
+from django.db import migrations
+
+""" frozen copy of core.similarity.bands, with the band count passed in """
+SIGNATURE_SIZE = 64
+
+
+def bands(sig, count):
+    """ Signed 64 bit hash of each band, empty without a signature """
+    if sig is None:
+        return []
+
+    rows_per_band = SIGNATURE_SIZE // count
+    hashes = []
+    for band in range(count):
+        rows = sig[band * rows_per_band:(band + 1) * rows_per_band]
+        digest = hashlib.blake2b(
+            struct.pack(f'>{rows_per_band + 1}I', band, *rows),
+            digest_size=8,
+        ).digest()
+        hashes.append(int.from_bytes(digest, 'big', signed=True))
+
+    return hashes
+
+
+def rehash_bands(apps, count):
+    """ Recut the stored signatures, a thousand recipes at a time """
+    Recipe = apps.get_model('core', 'Recipe')
+    recipes = Recipe.objects.exclude(minhash=None).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(recipes.filter(id__gt=last_id).only('id', 'minhash')[:1000])
+        if not chunk:
+            return
+        for recipe in chunk:
+            recipe.minhash_bands = bands(recipe.minhash, count)
+        Recipe.objects.bulk_update(chunk, ['minhash_bands'])
+        last_id = chunk[-1].id
+
+
+def wider_bands(apps, schema_editor):
+    rehash_bands(apps, 16)
+
+
+def narrower_bands(apps, schema_editor):
+    rehash_bands(apps, 32)
+
+
+class Migration(migrations.Migration):
+    """
+    Signatures are kept, only the band hashes change, 32 bands of 2 rows
+    made recipes sharing a fifth of their links candidates
+    """
+
+    dependencies = [
+        ('core', '0016_tombstone_change_seq_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(wider_bands, narrower_bands),
+    ]
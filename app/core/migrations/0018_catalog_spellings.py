@@ -0,0 +1,27 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    The catalog keeps one entry per spelling instead of per normalized
+    key, so the per-user name can be read from it
+    """
+
+    dependencies = [
+        ('core', '0017_recipe_minhash_wider_bands'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='catalogname',
+            name='key',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='catalogname',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
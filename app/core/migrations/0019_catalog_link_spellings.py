@@ -0,0 +1,62 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    return ' '.join(name.split()).casefold()
+
+
+def link_spellings(apps, schema_editor):
+    """ Point every tag and ingredient at the entry for its own spelling """
+    CatalogName = apps.get_model('core', 'CatalogName')
+    for model_name in ['Tag', 'Ingredient']:
+        model = apps.get_model('core', model_name)
+        names = model.objects.values_list('name', flat=True).distinct()
+        for name in names.iterator():
+            entry, created = CatalogName.objects.get_or_create(
+                name=name,
+                defaults={'key': normalize_name(name)},
+            )
+            model.objects.filter(name=name).update(catalog=entry)
+
+
+def copy_names_back(apps, schema_editor):
+    """ Fill the per-user name column again, keep one entry per key """
+    CatalogName = apps.get_model('core', 'CatalogName')
+    models_named = [
+        apps.get_model('core', model_name)
+        for model_name in ['Tag', 'Ingredient']
+    ]
+    for model in models_named:
+        model.objects.update(name=models.Subquery(
+            model.objects.filter(
+                pk=models.OuterRef('pk'),
+            ).values('catalog__name')[:1],
+        ))
+
+    kept = {}
+    for entry in CatalogName.objects.order_by('key', 'id').iterator():
+        kept.setdefault(entry.key, entry.pk)
+        if kept[entry.key] != entry.pk:
+            for model in models_named:
+                model.objects.filter(catalog=entry).update(
+                    catalog_id=kept[entry.key],
+                )
+            entry.delete()
+
+
+class Migration(migrations.Migration):
+    """
+    Point tags and ingredients at the entry of their own spelling, in a
+    transaction of its own so the schema changes around it never meet
+    pending foreign key checks
+    """
+
+    dependencies = [
+        ('core', '0018_catalog_spellings'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_spellings, copy_names_back),
+    ]
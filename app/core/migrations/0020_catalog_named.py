@@ -0,0 +1,59 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Tags and ingredients keep only the catalog id, the name is stored once
+    per spelling in the catalog. The user_id indexes are dropped, the
+    (user, catalog) and (user, change_seq) indexes lead with it. The name
+    gets a default first so reversing can add the column back
+    """
+
+    dependencies = [
+        ('core', '0019_catalog_link_spellings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='ingredient',
+            name='name',
+        ),
+        migrations.RemoveField(
+            model_name='tag',
+            name='name',
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='catalog',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='core.catalogname'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='catalog',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='core.catalogname'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_catalog_named'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['catalog', 'user'], name='ingredient_catalog_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['catalog', 'user'], name='tag_catalog_user_idx'),
+        ),
+    ]
@@ -1,11 +1,18 @@
 """
 Database Models
 """
+import bisect
 import uuid
 import os
+from collections import Counter
+from decimal import Decimal
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -21,6 +28,258 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads', 'recipe', filename)
 
 
+""" pg_advisory_xact_lock(int, int) namespace for per-user change locks """
+CHANGE_LOCK_NAMESPACE = 0x5E0
+
+
+def next_change_seq():
+    """ Take the next value from the shared change sequence """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('core_change_seq')")
+        return cursor.fetchone()[0]
+
+
+def lock_changes(cursor, user_id):
+    """
+    Take the user's change lock for the rest of the transaction, raw SQL
+    calls this before its nextval('core_change_seq')
+    """
+    cursor.execute(
+        'SELECT pg_advisory_xact_lock(%s, %s::integer)',
+        [CHANGE_LOCK_NAMESPACE, user_id],
+    )
+
+
+class NextChangeSeq(models.Func):
+    """
+    SQL expression for the next change sequence value, taken under a
+    transaction level lock on the owning user. Another transaction
+    writing for the user waits until this one ends, so a user's changes
+    commit in sequence order and a reader never sees a gap that is later
+    filled, see ChangesView.
+    """
+    template = (
+        "(SELECT nextval('core_change_seq') "
+        "FROM pg_advisory_xact_lock(%(namespace)s, %(expressions)s::integer))"
+    )
+    output_field = models.BigIntegerField()
+
+    def __init__(self, user_id, **extra):
+        if not hasattr(user_id, 'resolve_expression'):
+            user_id = models.Value(user_id)
+        super().__init__(user_id, namespace=CHANGE_LOCK_NAMESPACE, **extra)
+
+
+class ChangeTrackedModel(models.Model):
+    """
+    Stamp every write with a value from one database sequence shared by
+    all synced models, so clients can ask for everything after a token
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """ The value is taken inside the INSERT or UPDATE """
+        self.change_seq = NextChangeSeq(self.user_id)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, 'change_seq', 'updated_at',
+            }
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            """ loaded again on first access """
+            del self.change_seq
+
+
+def normalize_name(name):
+    """ Case-fold and collapse whitespace, 'Sea  Salt' matches 'sea salt' """
+    return ' '.join(name.split()).casefold()
+
+
+class CatalogNameManager(models.Manager):
+    """ Manager for the shared name catalog """
+
+    def intern(self, name):
+        """ Return the shared entry for a name, creating it if needed """
+        entry, created = self.get_or_create(
+            name=name,
+            defaults={'key': normalize_name(name)},
+        )
+        return entry
+
+    def hold(self, entry):
+        """
+        Key share lock `entry` for the rest of the transaction so prune()
+        passes it over, return it, or a fresh entry if it went already
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {self.model._meta.db_table} '
+                'WHERE id = %s FOR KEY SHARE',
+                [entry.pk],
+            )
+            if cursor.fetchone() is not None:
+                return entry
+        return self.intern(entry.name)
+
+    def suggest(self, user, prefix, limit, min_users):
+        """
+        Up to `limit` names starting with normalized `prefix`, one spelling
+        per key. Only names `user` has, or whose key at least `min_users`
+        users have, someone else's rare names stay private.
+        """
+        table = self.model._meta.db_table
+        tags_table = Tag._meta.db_table
+        ingredients_table = Ingredient._meta.db_table
+        pattern = (
+            prefix.replace('\\', '\\\\')
+            .replace('%', '\\%')
+            .replace('_', '\\_')
+        ) + '%'
+
+        """ each side stops after min_users users, popular names stay cheap """
+        return self.raw(f"""
+            SELECT DISTINCT ON (c.key) c.id, c.name, c.key
+            FROM {table} c
+            WHERE c.key LIKE %(pattern)s AND (
+                EXISTS (
+                    SELECT 1 FROM {tags_table} t
+                    WHERE t.user_id = %(user)s AND t.catalog_id = c.id
+                )
+                OR EXISTS (
+                    SELECT 1 FROM {ingredients_table} i
+                    WHERE i.user_id = %(user)s AND i.catalog_id = c.id
+                )
+                OR (
+                    SELECT count(DISTINCT users.user_id) FROM (
+                        (
+                            SELECT DISTINCT t.user_id FROM {tags_table} t
+                            JOIN {table} k ON k.id = t.catalog_id
+                            WHERE k.key = c.key
+                            LIMIT %(min_users)s
+                        )
+                        UNION ALL
+                        (
+                            SELECT DISTINCT i.user_id
+                            FROM {ingredients_table} i
+                            JOIN {table} k ON k.id = i.catalog_id
+                            WHERE k.key = c.key
+                            LIMIT %(min_users)s
+                        )
+                    ) AS users
+                ) >= %(min_users)s
+            )
+            ORDER BY c.key, c.id
+            LIMIT %(limit)s
+        """, {
+            'pattern': pattern,
+            'user': user.pk,
+            'min_users': min_users,
+            'limit': limit,
+        })
+
+    def prune(self, ids=None):
+        """
+        Delete the entries no tag or ingredient names, limited to `ids` if
+        given, return how many. Entries held by an open transaction are
+        skipped, see hold().
+        """
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT c.id FROM {table} c
+                    WHERE (%s::bigint[] IS NULL OR c.id = ANY(%s::bigint[]))
+                      AND NOT EXISTS (
+                        SELECT 1 FROM {Tag._meta.db_table} t
+                        WHERE t.catalog_id = c.id
+                      )
+                      AND NOT EXISTS (
+                        SELECT 1 FROM {Ingredient._meta.db_table} i
+                        WHERE i.catalog_id = c.id
+                      )
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, [ids, ids])
+            return cursor.rowcount
+
+
+class CatalogName(models.Model):
+    """
+    One row per distinct tag or ingredient name across all users, the
+    per-user rows only point here. Spellings are kept apart so every user
+    sees the name they typed, `key` groups them for matching
+    """
+    name = models.CharField(max_length=255, unique=True)
+    key = models.CharField(max_length=255)
+
+    objects = CatalogNameManager()
+
+    class Meta:
+        """ varchar_pattern_ops serves prefix LIKE for autocomplete """
+        indexes = [
+            models.Index(
+                fields=['key'],
+                name='catalog_key_prefix_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CatalogNamedManager(models.Manager):
+    """ The name lives in the catalog, always join it """
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('catalog')
+
+
+class CatalogNamedModel(ChangeTrackedModel):
+    """
+    Per-user tag or ingredient, named by its shared catalog entry. `name`
+    reads and sets the entry, filter and order on catalog__name
+    """
+    catalog = models.ForeignKey(
+        CatalogName,
+        on_delete=models.PROTECT,
+        db_index=False,
+    )
+
+    objects = CatalogNamedManager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def name(self):
+        return self.catalog.name
+
+    @name.setter
+    def name(self, value):
+        self.catalog = CatalogName.objects.intern(value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'catalog'} - {'name'}
+            update_fields = kwargs['update_fields']
+        if update_fields is not None and 'catalog' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+
+        """ keep the entry from being pruned before this row commits """
+        with transaction.atomic():
+            self.catalog = CatalogName.objects.hold(self.catalog)
+            super().save(*args, **kwargs)
+
+
 class UserManager(BaseUserManager):
     """Manager for Users"""
 
@@ -58,7 +317,148 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Recipe(models.Model):
+class VersionConflict(Exception):
+    """ The row was saved by someone else after it was read """
+
+    def __init__(self, pk, expected, current):
+        super().__init__(
+            f'recipe {pk} is at version {current}, not {expected}'
+        )
+        self.pk = pk
+        self.expected = expected
+        self.current = current
+
+
+class RecipeQuerySet(models.QuerySet):
+    """ Queries over recipes """
+
+    def with_links(self):
+        """
+        Prefetch tags and ingredient amounts for serializing, the amounts
+        join their ingredient and its catalog name in the same query
+        """
+        return self.prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredient_amounts',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient__catalog',
+                ),
+            ),
+        )
+
+
+class RecipeManager(models.Manager):
+    """ Manager for recipes """
+
+    def covered_by(self, ingredient_ids):
+        """
+        Recipes using any of `ingredient_ids`, annotated in one GROUP BY
+        with `covered` and `total` ingredient counts and the `missing`
+        ingredient ids. Candidates come from the (ingredient, recipe)
+        index on the link table.
+        """
+        have = models.Q(ingredient_amounts__ingredient_id__in=ingredient_ids)
+        candidates = RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids,
+        ).values('recipe_id')
+
+        return self.filter(id__in=candidates).annotate(
+            covered=models.Count('ingredient_amounts', filter=have),
+            total=models.Count('ingredient_amounts'),
+            missing=ArrayAgg(
+                'ingredient_amounts__ingredient_id',
+                filter=~have,
+                ordering='ingredient_amounts__ingredient_id',
+                default=models.Value(
+                    [],
+                    output_field=ArrayField(models.BigIntegerField()),
+                ),
+            ),
+        )
+
+    def similar_to(self, recipe):
+        """
+        The user's other recipes sharing a signature band with `recipe`,
+        annotated with `similarity`, the MinHash estimate of the Jaccard
+        similarity of their tag and ingredient sets
+        """
+        if recipe.minhash is None:
+            return self.none().annotate(similarity=models.Value(0.0))
+
+        table = self.model._meta.db_table
+        return self.filter(
+            user_id=recipe.user_id,
+            minhash_bands__overlap=recipe.minhash_bands,
+        ).exclude(pk=recipe.pk).annotate(
+            similarity=models.expressions.RawSQL(
+                f"""
+                (SELECT count(*) FROM unnest({table}.minhash, %s::integer[])
+                 AS pair(a, b) WHERE a = b)::float / %s
+                """,
+                (recipe.minhash, len(recipe.minhash)),
+                output_field=models.FloatField(),
+            ),
+        )
+
+    def duplicate(self, recipe, copies=1, title=None):
+        """
+        Copy a recipe and its tag and ingredient links `copies` times with
+        INSERT ... SELECT, return the new ids. Images are shared, stored
+        files are content addressed and reference counted. Copies have the
+        same links, so the similarity signature is copied too. No signals
+        fire, the copies are added to the user's RecipeStats here.
+        """
+        recipe_table = self.model._meta.db_table
+        tags_table = self.model.tags.through._meta.db_table
+        amounts_table = self.model.ingredients.through._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            lock_changes(cursor, recipe.user_id)
+            cursor.execute(f"""
+                INSERT INTO {recipe_table} (
+                    user_id, title, description, time_minutes, price, link,
+                    image, minhash, minhash_bands, version, updated_at,
+                    change_seq
+                )
+                SELECT user_id, COALESCE(%s, title), description,
+                       time_minutes, price, link, image, minhash,
+                       minhash_bands, 1, now(), nextval('core_change_seq')
+                FROM {recipe_table}, generate_series(1, %s)
+                WHERE id = %s
+                RETURNING id, user_id, time_minutes, price
+            """, [title, copies, recipe.pk])
+            rows = cursor.fetchall()
+            new_ids = sorted(row[0] for row in rows)
+
+            cursor.execute(f"""
+                INSERT INTO {tags_table} (recipe_id, tag_id)
+                SELECT copy.id, link.tag_id
+                FROM {tags_table} link, unnest(%s::bigint[]) AS copy(id)
+                WHERE link.recipe_id = %s
+                RETURNING tag_id
+            """, [new_ids, recipe.pk])
+            tag_counts = Counter(row[0] for row in cursor.fetchall())
+            cursor.execute(f"""
+                INSERT INTO {amounts_table} (
+                    recipe_id, ingredient_id, quantity, unit
+                )
+                SELECT copy.id, link.ingredient_id, link.quantity, link.unit
+                FROM {amounts_table} link, unnest(%s::bigint[]) AS copy(id)
+                WHERE link.recipe_id = %s
+            """, [new_ids, recipe.pk])
+
+            if rows:
+                RecipeStats.objects.apply(
+                    rows[0][1],
+                    added=[(row[2], row[3]) for row in rows],
+                    tags=tag_counts,
+                )
+
+        return new_ids
+
+
+class Recipe(ChangeTrackedModel):
     """ Recipe Object """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -70,32 +470,464 @@ class Recipe(models.Model):
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
-    ingredients = models.ManyToManyField('Ingredient')
+    ingredients = models.ManyToManyField(
+        'Ingredient',
+        through='RecipeIngredient',
+    )
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    """ MinHash of tags and ingredients, see core/similarity.py """
+    minhash = ArrayField(
+        models.IntegerField(),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    minhash_bands = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+    )
+    """ bumped by every save, an update only applies to the version read """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = RecipeManager.from_queryset(RecipeQuerySet)()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """ Remember the values counted in RecipeStats """
+        instance = super().from_db(db, field_names, values)
+        instance._counted = (
+            instance.__dict__.get('time_minutes'),
+            instance.__dict__.get('price'),
+        )
+        return instance
+
+    def save(self, *args, expected_version=None, **kwargs):
+        """
+        Updates run as UPDATE ... WHERE version = <read version>, or
+        `expected_version` when given, and raise VersionConflict if the
+        row has moved on since
+        """
+        self._checked_version = None
+        if not self._state.adding:
+            if expected_version is None:
+                expected_version = self.version
+            self._checked_version = expected_version
+            self.version = expected_version + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        try:
+            super().save(*args, **kwargs)
+        except VersionConflict:
+            self.version = self._checked_version
+            raise
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        checked = getattr(self, '_checked_version', None)
+        if checked is None:
+            return super()._do_update(base_qs, using, pk_val, values,
+                                      update_fields, forced_update)
+
+        updated = super()._do_update(
+            base_qs.filter(version=checked), using, pk_val, values,
+            update_fields, forced_update,
+        )
+        if not updated:
+            current = base_qs.filter(pk=pk_val).values_list(
+                'version', flat=True,
+            ).first()
+            if current is not None:
+                raise VersionConflict(pk_val, checked, current)
+        return updated
+
+    class Meta:
+        """
+        Serve per-user ordering and range filters, id breaks ties,
+        reference counts of shared image files and similarity candidates
+        """
+        indexes = [
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx',
+            ),
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='recipe_user_change_idx',
+            ),
+            models.Index(
+                fields=['image'],
+                name='recipe_image_idx',
+                condition=models.Q(image__isnull=False),
+            ),
+            GinIndex(
+                fields=['minhash_bands'],
+                name='recipe_minhash_bands_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class Tag(CatalogNamedModel):
     """ Tag for filtering recipes """
-    name = models.CharField(max_length=255)
+    """ no indexes of their own, the composite indexes below lead """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='tag_user_change_idx',
+            ),
+            models.Index(
+                fields=['user', 'catalog'],
+                name='tag_user_catalog_idx',
+            ),
+            models.Index(
+                fields=['catalog', 'user'],
+                name='tag_catalog_user_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(CatalogNamedModel):
     """ Ingredient for recipes """
-    name = models.CharField(max_length=255)
+    """ no indexes of their own, the composite indexes below lead """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='ingredient_user_change_idx',
+            ),
+            models.Index(
+                fields=['user', 'catalog'],
+                name='ingredient_user_catalog_idx',
+            ),
+            models.Index(
+                fields=['catalog', 'user'],
+                name='ingredient_catalog_user_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class RecipeIngredientQuerySet(models.QuerySet):
+    """ Queries over recipe ingredient amounts """
+
+    def with_base_units(self):
+        """
+        Annotate `base_unit` and `base_quantity`, converting every amount
+        to grams, millilitres or pieces so different units can be summed
+        """
+        units = RecipeIngredient.UNIT_CONVERSIONS.items()
+        return self.annotate(
+            base_unit=models.Case(
+                *[models.When(unit=unit, then=models.Value(base))
+                  for unit, (base, factor) in units],
+                default=models.F('unit'),
+                output_field=models.CharField(),
+            ),
+            base_quantity=models.ExpressionWrapper(
+                models.F('quantity') * models.Case(
+                    *[models.When(unit=unit, then=models.Value(factor))
+                      for unit, (base, factor) in units],
+                    default=models.Value(Decimal(1)),
+                    output_field=models.DecimalField(),
+                ),
+                output_field=models.DecimalField(),
+            ),
+        )
+
+
+class RecipeIngredient(models.Model):
+    """ Amount of an ingredient used in a recipe """
+    GRAM = 'g'
+    KILOGRAM = 'kg'
+    MILLILITRE = 'ml'
+    LITRE = 'l'
+    TEASPOON = 'tsp'
+    TABLESPOON = 'tbsp'
+    CUP = 'cup'
+    PIECE = 'piece'
+    UNIT_CHOICES = [
+        (GRAM, 'Grams'),
+        (KILOGRAM, 'Kilograms'),
+        (MILLILITRE, 'Millilitres'),
+        (LITRE, 'Litres'),
+        (TEASPOON, 'Teaspoons'),
+        (TABLESPOON, 'Tablespoons'),
+        (CUP, 'Cups'),
+        (PIECE, 'Pieces'),
+    ]
+    """ unit -> (base unit, factor), base units are absent from the map """
+    UNIT_CONVERSIONS = {
+        KILOGRAM: (GRAM, Decimal('1000')),
+        LITRE: (MILLILITRE, Decimal('1000')),
+        TEASPOON: (MILLILITRE, Decimal('4.92892')),
+        TABLESPOON: (MILLILITRE, Decimal('14.78676')),
+        CUP: (MILLILITRE, Decimal('236.58824')),
+    }
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='ingredient_amounts',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    quantity = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        null=True,
+        blank=True,
+    )
+    unit = models.CharField(max_length=10, choices=UNIT_CHOICES, blank=True)
+
+    objects = RecipeIngredientQuerySet.as_manager()
+
+    class Meta:
+        """
+        Reuses the table of the former auto-created M2M. The unique pair
+        serves lookups by recipe, the reversed index lookups by ingredient
+        without visiting the table.
+        """
+        db_table = 'core_recipe_ingredients'
+        unique_together = [['recipe', 'ingredient']]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipe_ingredient_cover_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity or ""} {self.unit} {self.ingredient}'.strip()
+
+
+class Tombstone(models.Model):
+    """ Record of a deleted synced object, kept for the change feed """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField(default=0, editable=False)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='tombstone_user_change_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+    def save(self, *args, **kwargs):
+        """ Tombstones are only inserted, see ChangeTrackedModel.save """
+        self.change_seq = NextChangeSeq(self.user_id)
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            del self.change_seq
+
+
+def empty_price_histogram():
+    return [0] * (len(RecipeStats.PRICE_BUCKETS) + 1)
+
+
+class RecipeStatsManager(models.Manager):
+    """ Manager for per-user recipe statistics """
+
+    def apply(self, user_id, added=(), removed=(), tags=None):
+        """
+        Count recipes in `added` and out of `removed`, both lists of
+        (time_minutes, price), and add `tags`, {tag id: delta}, to the
+        tag counts. The row is locked so concurrent writes serialize.
+        """
+        if added:
+            self.get_or_create(user_id=user_id)
+
+        with transaction.atomic():
+            stats = self.select_for_update().filter(user_id=user_id).first()
+            if stats is None:
+                """ nothing counted yet, or the user is being deleted """
+                return
+
+            for sign, recipes in ((1, added), (-1, removed)):
+                for time_minutes, price in recipes:
+                    stats.recipe_count += sign
+                    stats.time_minutes_total += sign * time_minutes
+                    stats.price_total += sign * price
+                    stats.price_histogram[stats.bucket(price)] += sign
+
+            for tag_id, delta in (tags or {}).items():
+                count = stats.tag_counts.get(str(tag_id), 0) + delta
+                if count > 0:
+                    stats.tag_counts[str(tag_id)] = count
+                else:
+                    stats.tag_counts.pop(str(tag_id), None)
+
+            stats.save()
+
+
+class RecipeStats(models.Model):
+    """
+    Running totals of a user's recipes, kept up to date by the signal
+    handlers in core/signals.py so dashboards read one row
+    """
+    """ upper bounds of each price bucket, the last bucket is open """
+    PRICE_BUCKETS = [Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50')]
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats',
+    )
+    recipe_count = models.IntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0'),
+    )
+    price_histogram = ArrayField(
+        models.IntegerField(),
+        default=empty_price_histogram,
+    )
+    """ str(tag id) -> number of the user's recipes with the tag """
+    tag_counts = models.JSONField(default=dict)
+
+    objects = RecipeStatsManager()
+
+    @classmethod
+    def bucket(cls, price):
+        """ Index of the histogram bucket a price falls in """
+        return bisect.bisect_right(cls.PRICE_BUCKETS, price)
+
+    @property
+    def average_time_minutes(self):
+        if not self.recipe_count:
+            return None
+        return self.time_minutes_total / self.recipe_count
+
+    @property
+    def average_price(self):
+        if not self.recipe_count:
+            return None
+        return self.price_total / self.recipe_count
+
+    def price_distribution(self):
+        """ [{'min', 'max', 'count'}] per bucket, None for open bounds """
+        bounds = [None, *self.PRICE_BUCKETS, None]
+        return [
+            {'min': low, 'max': high, 'count': count}
+            for low, high, count in zip(
+                bounds, bounds[1:], self.price_histogram,
+            )
+        ]
+
+    def top_tag_ids(self, limit):
+        """ Ids of the most used tags, ties broken by id """
+        return [
+            int(tag_id) for tag_id, count in sorted(
+                self.tag_counts.items(),
+                key=lambda item: (-item[1], int(item[0])),
+            )[:limit]
+        ]
+
+    def __str__(self):
+        return f'{self.user} ({self.recipe_count} recipes)'
+
+
+class Job(models.Model):
+    """ Background work item, claimed by `manage.py run_workers` """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """ Small partial indexes covering only claimable jobs """
+        indexes = [
+            models.Index(
+                fields=['run_after'],
+                condition=models.Q(status='queued'),
+                name='job_queued_idx',
+            ),
+            models.Index(
+                fields=['locked_until'],
+                condition=models.Q(status='running'),
+                name='job_running_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
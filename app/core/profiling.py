@@ -0,0 +1,162 @@
+"""
+Sampled request profiling
+
+ProfilerMiddleware profiles a random PROFILER_SAMPLE_RATE fraction of
+requests, plus any request carrying a valid signed PROFILER_HEADER. Each
+profile holds the call tree and the SQL that ran, and is kept in a ring
+buffer of PROFILER_MAX_PROFILES slots in the shared cache, so profiles
+from every worker show up at /admin/profiles/.
+"""
+import cProfile
+import io
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+try:
+    from pyinstrument import Profiler as CallTreeProfiler
+except ImportError:  # optional, falls back to cProfile statistics
+    CallTreeProfiler = None
+
+SIGNING_SALT = 'core.profiling'
+CACHE_PREFIX = 'profiles'
+STATS_LINES = 60
+
+
+def make_token():
+    """ Signed value for the debug header, valid for PROFILER_TOKEN_MAX_AGE """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('profile')
+
+
+def valid_token(token):
+    """ Check a debug header value """
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token,
+            max_age=settings.PROFILER_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return False
+
+    return True
+
+
+def store_profile(profile):
+    """ Write a profile into the next ring buffer slot """
+    size = settings.PROFILER_MAX_PROFILES
+    """ add() is a no-op once the counter exists """
+    cache.add(f'{CACHE_PREFIX}:counter', 0, None)
+    slot = cache.incr(f'{CACHE_PREFIX}:counter') % size
+    cache.set(f'{CACHE_PREFIX}:slot:{slot}', profile, None)
+
+
+def recent_profiles():
+    """ Stored profiles, newest first """
+    size = settings.PROFILER_MAX_PROFILES
+    keys = [f'{CACHE_PREFIX}:slot:{slot}' for slot in range(size)]
+    profiles = list(cache.get_many(keys).values())
+
+    return sorted(profiles, key=lambda p: p['started_at'], reverse=True)
+
+
+def get_profile(profile_id):
+    """ Find a stored profile by id """
+    for profile in recent_profiles():
+        if profile['id'] == profile_id:
+            return profile
+
+    return None
+
+
+class QueryCollector:
+    """ Database execute wrapper recording every statement and its time """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+            })
+
+
+class ProfilerMiddleware:
+    """ Profile sampled or explicitly requested requests """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.headers.get(settings.PROFILER_HEADER)
+        if token is not None:
+            return valid_token(token)
+
+        return random.random() < settings.PROFILER_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        collector = QueryCollector()
+        started_at = timezone.now()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response, call_tree = self.profile(request)
+        duration = time.perf_counter() - start
+
+        profile_id = uuid.uuid4().hex
+        store_profile({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'started_at': started_at,
+            'ms': round(duration * 1000, 3),
+            'sql_ms': round(sum(q['ms'] for q in collector.queries), 3),
+            'queries': collector.queries,
+            'call_tree': call_tree,
+        })
+        response['X-Profile-Id'] = profile_id
+        return response
+
+    def profile(self, request):
+        """ Run the request under a profiler, return (response, report) """
+        if CallTreeProfiler is not None:
+            profiler = CallTreeProfiler()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            return response, profiler.output_text(unicode=True)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(STATS_LINES)
+        return response, output.getvalue()
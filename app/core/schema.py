@@ -0,0 +1,98 @@
+"""
+Precomputed OpenAPI schema
+
+Generating the schema introspects every viewset and serializer, so it is
+built once (at image build time by `manage.py build_schema`, otherwise on
+first request) and then served from memory for the life of the process.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import drf_spectacular
+from django.conf import settings
+from django.utils import translation
+from drf_spectacular.settings import spectacular_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def source_fingerprint():
+    """ Hash the project source, changes whenever the code changes """
+    base_dir = Path(settings.BASE_DIR)
+    digest = hashlib.sha256(drf_spectacular.__version__.encode())
+
+    for path in sorted(base_dir.rglob('*.py')):
+        digest.update(str(path.relative_to(base_dir)).encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()
+
+
+def generate_schema(version=None):
+    """ Run the schema generator, the expensive part """
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        api_version=version,
+    )
+    return generator.get_schema(request=None, public=True)
+
+
+def write_schema_artifact(path):
+    """ Generate the schema and save it alongside the source fingerprint """
+    artifact = {
+        'fingerprint': source_fingerprint(),
+        'schema': generate_schema(),
+    }
+    with open(path, 'w') as f:
+        json.dump(artifact, f, cls=JSONEncoder)
+
+    return artifact
+
+
+def load_schema_artifact(path):
+    """ Return the saved schema if it was built from the current source """
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if artifact.get('fingerprint') != source_fingerprint():
+        return None
+
+    return artifact['schema']
+
+
+class CachedSchema:
+    """ Schema data plus its rendered representations """
+
+    def __init__(self, data):
+        self.data = data
+        self._rendered = {}
+
+    def render(self, renderer):
+        """ Render once per media type, return (content, etag) """
+        if renderer.media_type not in self._rendered:
+            content = renderer.render(self.data, renderer_context={})
+            etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+            self._rendered[renderer.media_type] = (content, etag)
+
+        return self._rendered[renderer.media_type]
+
+
+_cache = {}
+
+
+def get_schema(version=None):
+    """ Return the cached schema for an API version and active language """
+    language = translation.get_language()
+    key = (version, language)
+
+    if key not in _cache:
+        data = None
+        if version is None and language == settings.LANGUAGE_CODE:
+            data = load_schema_artifact(settings.SCHEMA_ARTIFACT)
+        if data is None:
+            data = generate_schema(version)
+        _cache[key] = CachedSchema(data)
+
+    return _cache[key]
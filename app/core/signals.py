@@ -0,0 +1,153 @@
+"""
+Signal handlers for core models
+"""
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import similarity
+from core.models import Ingredient, NextChangeSeq, Recipe, RecipeStats, Tag
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """ Changing a recipe's tags or ingredients changes the recipe """
+    if reverse:
+        """ instance is a tag or ingredient, pk_set holds recipe ids """
+        if action == 'pre_clear':
+            links = sender.objects.filter(
+                **{f'{instance._meta.model_name}_id': instance.pk}
+            )
+            instance._cleared_recipe_ids = list(
+                links.values_list('recipe_id', flat=True)
+            )
+            return
+        if action == 'post_clear':
+            pk_set = getattr(instance, '_cleared_recipe_ids', [])
+    else:
+        pk_set = [instance.pk]
+
+    if action in ('post_add', 'post_remove', 'post_clear') and pk_set:
+        Recipe.objects.filter(pk__in=pk_set).update(
+            change_seq=NextChangeSeq(F('user_id')),
+            updated_at=timezone.now(),
+        )
+        similarity.refresh(pk_set)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def count_tags_on_m2m_change(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """ Keep RecipeStats.tag_counts in step with the tag links """
+    own, other = 'recipe_id', 'tag_id'
+    if reverse:
+        own, other = other, own
+
+    if action in ('pre_remove', 'pre_clear'):
+        """ pk_set may name unlinked objects, note the real links """
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._uncounted_links = list(
+            links.values_list(other, flat=True)
+        )
+        return
+
+    if action == 'post_add':
+        sign, linked = 1, pk_set
+    elif action in ('post_remove', 'post_clear'):
+        sign, linked = -1, getattr(instance, '_uncounted_links', [])
+    else:
+        return
+
+    if not linked:
+        return
+    if reverse:
+        tags = {instance.pk: sign * len(linked)}
+    else:
+        tags = {tag_id: sign for tag_id in linked}
+    RecipeStats.objects.apply(instance.user_id, tags=tags)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """ The cascade removes links without m2m_changed, note them first """
+    field = 'tags' if sender is Tag else 'ingredients'
+    instance._linked_recipe_ids = list(
+        Recipe.objects.filter(**{field: instance}).values_list(
+            'id', flat=True,
+        )
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_signatures_on_delete(sender, instance, **kwargs):
+    """ Drop the deleted tag or ingredient from recipe signatures """
+    linked = getattr(instance, '_linked_recipe_ids', [])
+    similarity.refresh(linked)
+    if sender is Tag and linked:
+        RecipeStats.objects.apply(
+            instance.user_id,
+            tags={instance.pk: -len(linked)},
+        )
+
+
+def counted_values(recipe):
+    return (int(recipe.time_minutes), Decimal(str(recipe.price)))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_counted_values(sender, instance, **kwargs):
+    """ Values the stats hold for this recipe, None for a new one """
+    if instance._state.adding:
+        instance._counted = None
+    elif None in getattr(instance, '_counted', (None, None)):
+        """ loaded with deferred fields or built by hand """
+        instance._counted = Recipe.objects.filter(
+            pk=instance.pk,
+        ).values_list('time_minutes', 'price').first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_on_save(sender, instance, **kwargs):
+    """ Move the recipe's time and price into RecipeStats """
+    current = counted_values(instance)
+    before = instance._counted
+    if before != current:
+        RecipeStats.objects.apply(
+            instance.user_id,
+            added=[current],
+            removed=[before] if before else [],
+        )
+    instance._counted = current
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_counted_tags(sender, instance, **kwargs):
+    """ The cascade removes tag links without m2m_changed """
+    instance._counted_tag_ids = list(
+        instance.tags.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe_on_delete(sender, instance, **kwargs):
+    """ Take the recipe and its tag links out of RecipeStats """
+    RecipeStats.objects.apply(
+        instance.user_id,
+        removed=[counted_values(instance)],
+        tags={tag_id: -1 for tag_id in instance._counted_tag_ids},
+    )
@@ -0,0 +1,144 @@
+"""
+Recipe similarity signatures
+
+Every recipe stores a MinHash signature of its tag and ingredient set,
+SIGNATURE_SIZE minima of independent hash functions. The share of equal
+positions in two signatures estimates the Jaccard similarity of the sets.
+The signature is also cut into BANDS bands whose hashes are kept in a GIN
+indexed array, recipes sharing any band hash are the candidates, so a
+lookup touches the recipes likely to be similar instead of all of them.
+
+Signatures are refreshed from the m2m_changed and delete signals, inside
+batch() the refresh is deferred until the block ends.
+"""
+import hashlib
+import random
+import struct
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps
+
+SIGNATURE_SIZE = 64
+"""
+Two sets become candidates with probability 1 - (1 - s ** ROWS) ** BANDS,
+16 bands of 4 rows put the threshold near (1 / 16) ** (1 / 4) = 0.5, so
+loosely related recipes stay out of the candidate set.
+python -m benchmarks.similarity compares the layouts.
+"""
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+
+""" h(x) = (a * x + b) mod p, fixed so stored signatures stay comparable """
+PRIME = 2 ** 31 - 1
+_rng = random.Random(0x5EED)
+HASH_PARAMS = [
+    (_rng.randrange(1, PRIME), _rng.randrange(0, PRIME))
+    for _ in range(SIGNATURE_SIZE)
+]
+
+_pending = threading.local()
+
+
+def features(tag_ids, ingredient_ids):
+    """ One integer per tag and ingredient, kinds never collide """
+    return {2 * pk for pk in tag_ids} | {2 * pk + 1 for pk in ingredient_ids}
+
+
+def signature(feature_set):
+    """ MinHash signature of a feature set, None when it is empty """
+    if not feature_set:
+        return None
+
+    return [
+        min((a * x + b) % PRIME for x in feature_set)
+        for a, b in HASH_PARAMS
+    ]
+
+
+def bands(sig):
+    """ Signed 64 bit hash of each band, empty without a signature """
+    if sig is None:
+        return []
+
+    hashes = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f'>{ROWS + 1}I', band, *rows),
+            digest_size=8,
+        ).digest()
+        hashes.append(int.from_bytes(digest, 'big', signed=True))
+
+    return hashes
+
+
+def compute(recipe_ids, recipe_model=None):
+    """ Return {recipe id: (signature, bands)} read from the link tables """
+    recipe_model = recipe_model or apps.get_model('core', 'Recipe')
+    tag_links = recipe_model.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).values_list('recipe_id', 'tag_id')
+    amount_links = recipe_model.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).values_list('recipe_id', 'ingredient_id')
+
+    tags = {pk: set() for pk in recipe_ids}
+    ingredients = {pk: set() for pk in recipe_ids}
+    for recipe_id, tag_id in tag_links:
+        tags[recipe_id].add(tag_id)
+    for recipe_id, ingredient_id in amount_links:
+        ingredients[recipe_id].add(ingredient_id)
+
+    result = {}
+    for pk in recipe_ids:
+        sig = signature(features(tags[pk], ingredients[pk]))
+        result[pk] = (sig, bands(sig))
+
+    return result
+
+
+def refresh(recipe_ids, recipe_model=None):
+    """ Recompute and store signatures, or defer them inside batch() """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+
+    pending = getattr(_pending, 'ids', None)
+    if pending is not None and recipe_model is None:
+        pending.update(recipe_ids)
+        return
+
+    recipe_model = recipe_model or apps.get_model('core', 'Recipe')
+    """ a cascade may have deleted the recipes already """
+    recipe_ids = list(recipe_model.objects.filter(
+        pk__in=recipe_ids,
+    ).values_list('pk', flat=True))
+    if not recipe_ids:
+        return
+
+    recipe_model.objects.bulk_update(
+        [
+            recipe_model(pk=pk, minhash=sig, minhash_bands=band_hashes)
+            for pk, (sig, band_hashes) in compute(
+                recipe_ids, recipe_model,
+            ).items()
+        ],
+        ['minhash', 'minhash_bands'],
+    )
+
+
+@contextmanager
+def batch():
+    """ Refresh each touched recipe once, when the block ends """
+    if getattr(_pending, 'ids', None) is not None:
+        yield
+        return
+
+    _pending.ids = set()
+    try:
+        yield
+        recipe_ids = _pending.ids
+    finally:
+        _pending.ids = None
+    refresh(recipe_ids)
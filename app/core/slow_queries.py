@@ -0,0 +1,302 @@
+"""
+Slow query log
+
+Every query runs through a database execute wrapper while a request or
+background job is handled. Statements slower than SLOW_QUERY_MS are
+logged with the view or job they came from and a fingerprint, the SQL
+with literals and IN lists collapsed, and aggregated per fingerprint in
+the shared cache. The first slow SELECT of each fingerprint in every
+SLOW_QUERY_EXPLAIN_INTERVAL is run again under EXPLAIN (ANALYZE, BUFFERS)
+and the plan is kept with the aggregate, SELECTs that lock rows or call
+volatile functions only get a plain EXPLAIN. `manage.py slow_queries`
+prints the report.
+
+Workers share the aggregates, so counters are only changed with add()
+and incr(), which the cache applies atomically. Fingerprints take slots
+of a ring of SLOW_QUERY_MAX_FINGERPRINTS, the oldest is dropped.
+"""
+import hashlib
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'slowq'
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+LOCKING_CLAUSE = re.compile(
+    r'\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b',
+    re.IGNORECASE,
+)
+FUNCTION_CALL = re.compile(r'\b([a-z_][a-z0-9_]*)\s*\(', re.IGNORECASE)
+
+""" {connection alias: names of volatile functions} """
+_volatile_functions = {}
+
+
+def fingerprint(sql):
+    """ Return (normalized sql, short hash) grouping equivalent queries """
+    normalized = sql.replace('%s', '?')
+    normalized = STRING_LITERAL.sub('?', normalized)
+    normalized = NUMBER_LITERAL.sub('?', normalized)
+    normalized = VALUE_LIST.sub('(...)', normalized)
+    normalized = WHITESPACE.sub(' ', normalized).strip()
+    digest = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+    return normalized, digest
+
+
+def explainable(sql):
+    """ Only reads are explained """
+    return sql.lstrip().upper().startswith('SELECT')
+
+
+def analyzable(sql, volatile_functions):
+    """
+    EXPLAIN ANALYZE executes the query again, only do that when it takes
+    no row locks and calls no volatile function such as nextval()
+    """
+    if LOCKING_CLAUSE.search(sql):
+        return False
+    called = FUNCTION_CALL.findall(STRING_LITERAL.sub('?', sql))
+    return not {name.lower() for name in called} & volatile_functions
+
+
+def increment(key, delta=1):
+    """ Atomically add to a counter, add() is a no-op once it exists """
+    cache.add(key, 0, None)
+    return cache.incr(key, delta)
+
+
+def origin_ids(digest):
+    """ Hashes of the origins recorded for a fingerprint """
+    key = f'{CACHE_PREFIX}:fp:{digest}'
+    count = cache.get(f'{key}:origins', 0)
+    return list(cache.get_many(
+        [f'{key}:origins:{n}' for n in range(1, count + 1)]
+    ).values())
+
+
+def fingerprint_keys(digest, origins):
+    """ Every cache key holding the aggregate of a fingerprint """
+    key = f'{CACHE_PREFIX}:fp:{digest}'
+    return [
+        f'{key}:{field}'
+        for field in ['sql', 'count', 'total_us', 'max_us', 'explain',
+                      'origins']
+    ] + [
+        f'{key}:origins:{n}' for n in range(1, len(origins) + 1)
+    ] + [
+        f'{key}:origin:{origin_id}:{part}'
+        for origin_id in origins
+        for part in ['name', 'count']
+    ]
+
+
+def record(digest, normalized, origin, ms, plan=None):
+    """ Add one slow execution to its fingerprint's aggregate """
+    key = f'{CACHE_PREFIX}:fp:{digest}'
+    if cache.add(f'{key}:sql', normalized, None):
+        """ new fingerprint, takes the next slot of a bounded ring """
+        size = settings.SLOW_QUERY_MAX_FINGERPRINTS
+        slot = increment(f'{CACHE_PREFIX}:counter') % size
+        slot_key = f'{CACHE_PREFIX}:slot:{slot}'
+        dropped = cache.get(slot_key)
+        cache.set(slot_key, digest, None)
+        if dropped and dropped != digest:
+            cache.delete_many(fingerprint_keys(dropped, origin_ids(dropped)))
+
+    us = int(ms * 1000)
+    increment(f'{key}:count')
+    increment(f'{key}:total_us', us)
+    """ the maximum alone may lose a race, it is a hint """
+    if us > cache.get(f'{key}:max_us', 0):
+        cache.set(f'{key}:max_us', us, None)
+    if plan is not None:
+        cache.set(f'{key}:explain', plan, None)
+
+    origin_id = hashlib.sha1(origin.encode()).hexdigest()[:16]
+    if cache.add(f'{key}:origin:{origin_id}:name', origin, None):
+        n = increment(f'{key}:origins')
+        cache.set(f'{key}:origins:{n}', origin_id, None)
+    increment(f'{key}:origin:{origin_id}:count')
+
+
+def load(digest):
+    """ The aggregate of one fingerprint, None once it was dropped """
+    key = f'{CACHE_PREFIX}:fp:{digest}'
+    ids = origin_ids(digest)
+    values = cache.get_many(fingerprint_keys(digest, ids))
+    if f'{key}:sql' not in values:
+        return None
+
+    origins = {}
+    for origin_id in ids:
+        name = values.get(f'{key}:origin:{origin_id}:name')
+        if name is not None:
+            origins[name] = values.get(f'{key}:origin:{origin_id}:count', 0)
+
+    return {
+        'fingerprint': digest,
+        'sql': values[f'{key}:sql'],
+        'count': values.get(f'{key}:count', 0),
+        'total_ms': values.get(f'{key}:total_us', 0) / 1000,
+        'max_ms': values.get(f'{key}:max_us', 0) / 1000,
+        'origins': origins,
+        'explain': values.get(f'{key}:explain'),
+    }
+
+
+def digests():
+    """ Fingerprints currently in the ring """
+    size = settings.SLOW_QUERY_MAX_FINGERPRINTS
+    keys = [f'{CACHE_PREFIX}:slot:{slot}' for slot in range(size)]
+    return set(cache.get_many(keys).values())
+
+
+def report():
+    """ Aggregates for every recorded fingerprint, most total time first """
+    entries = [load(digest) for digest in digests()]
+
+    return sorted(
+        [entry for entry in entries if entry is not None],
+        key=lambda entry: entry['total_ms'],
+        reverse=True,
+    )
+
+
+def reset():
+    """ Forget every recorded fingerprint """
+    size = settings.SLOW_QUERY_MAX_FINGERPRINTS
+    keys = [f'{CACHE_PREFIX}:slot:{slot}' for slot in range(size)]
+    for digest in digests():
+        keys += fingerprint_keys(digest, origin_ids(digest))
+    cache.delete_many(keys + [f'{CACHE_PREFIX}:counter'])
+
+
+class SlowQueryLogger:
+    """ Execute wrapper timing queries for one request or job """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        ms = (time.perf_counter() - start) * 1000
+
+        if ms >= settings.SLOW_QUERY_MS and not self.explaining:
+            self.slow(sql, params, many, ms, context['connection'])
+
+        return result
+
+    def slow(self, sql, params, many, ms, connection):
+        normalized, digest = fingerprint(sql)
+        logger.warning(
+            'Slow query %.1fms in %s [%s]: %s',
+            ms, self.origin, digest, normalized,
+        )
+
+        plan = None
+        if (not many and connection.vendor == 'postgresql'
+                and explainable(sql) and self.sample_explain(digest)):
+            plan = self.explain(sql, params, connection)
+
+        record(digest, normalized, self.origin, ms, plan)
+
+    def sample_explain(self, digest):
+        """ True for the first slow run of a fingerprint per interval """
+        return cache.add(
+            f'{CACHE_PREFIX}:explained:{digest}',
+            True,
+            settings.SLOW_QUERY_EXPLAIN_INTERVAL,
+        )
+
+    def volatile_functions(self, connection):
+        """ Names of the volatile functions, read once per process """
+        if connection.alias not in _volatile_functions:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT DISTINCT proname FROM pg_proc "
+                    "WHERE provolatile = 'v'"
+                )
+                _volatile_functions[connection.alias] = {
+                    row[0] for row in cursor.fetchall()
+                }
+        return _volatile_functions[connection.alias]
+
+    def explain(self, sql, params, connection):
+        """ Run the query again under EXPLAIN, never raise """
+        self.explaining = True
+        try:
+            """ savepoint, a failed EXPLAIN must not abort the request """
+            with transaction.atomic(using=connection.alias), \
+                    connection.cursor() as cursor:
+                if analyzable(sql, self.volatile_functions(connection)):
+                    options = '(ANALYZE, BUFFERS) '
+                else:
+                    options = ''
+                cursor.execute(f'EXPLAIN {options}{sql}', params)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception:
+            logger.exception('Could not EXPLAIN slow query')
+            return None
+        finally:
+            self.explaining = False
+
+
+@contextmanager
+def slow_query_log(origin):
+    """ Time every query on every connection inside the block """
+    if not settings.SLOW_QUERY_MS:
+        yield None
+        return
+
+    query_logger = SlowQueryLogger(origin)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(query_logger))
+        yield query_logger
+
+
+def view_name(view_func, request):
+    """ Readable name such as RecipeViewSet.list or ChangesView """
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__qualname__}'
+
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower())
+        if action:
+            return f'{cls.__name__}.{action}'
+
+    return cls.__name__
+
+
+class SlowQueryMiddleware:
+    """ Attribute slow queries to the view handling the request """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_query_log(request.path_info) as query_logger:
+            request.slow_query_logger = query_logger
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.slow_query_logger.origin = view_name(view_func, request)
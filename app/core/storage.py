@@ -0,0 +1,158 @@
+"""
+File storage backends
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip variants are written without it
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Hashed static files with precompressed variants
+
+    Next to every hashed file collectstatic writes `.gz` (and `.br` when
+    the brotli package is installed) so the proxy can serve compressed
+    bytes straight from disk.
+    """
+    compress_extensions = (
+        '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+        '.ico', '.ttf', '.otf', '.eot',
+    )
+    min_compress_size = 256
+
+    def stored_name(self, name):
+        """ Use plain names until collectstatic has built a manifest """
+        if not self.hashed_files:
+            return name
+
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for hashed_name in sorted(hashed_names):
+            self._compress(hashed_name)
+
+    def _compress(self, name):
+        """ Write compressed variants when they are worth keeping """
+        if not name.endswith(self.compress_extensions):
+            return
+
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < self.min_compress_size:
+            return
+
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+
+        for suffix, compressed in variants:
+            if len(compressed) >= len(content) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+class ContentAddressedStorageMixin:
+    """
+    Name stored files after the SHA-256 of their content
+
+    The directory and extension of the requested name are kept, the rest
+    is replaced by the hash, so identical uploads share one file and a
+    name never points at different bytes. Nothing is deleted inline, an
+    upload of the same content may be about to refer to a file that looks
+    orphaned. `manage.py gc_media` removes files no row refers to once
+    they are untouched for a grace period.
+    """
+
+    def content_name(self, name, content):
+        """ Content-addressed name for `content` saved as `name` """
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        return posixpath.join(directory, hexdigest[:2], hexdigest + ext)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+        if self.exists(name):
+            """ already stored, mark it as recently used for gc_media """
+            self.touch(name)
+            return name
+
+        return super().save(name, content, max_length)
+
+    def touch(self, name):
+        """ Refresh the modified time where the backend allows it """
+        pass
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin,
+                                        FileSystemStorage):
+    """ Deduplicated media on the local filesystem """
+
+    def touch(self, name):
+        os.utime(self.path(name))
+
+
+class PrivateFileSystemStorage(FileSystemStorage):
+    """
+    Files only handed out through authenticated views, kept in
+    EXPORT_ROOT outside the media root the proxy serves
+    """
+
+    def __init__(self, location=None, **kwargs):
+        super().__init__(location=location or settings.EXPORT_ROOT, **kwargs)
+
+    def url(self, name):
+        raise NotImplementedError('private files have no public URL')
+
+
+def file_fields():
+    """ Every (model, field) pair storing files """
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def file_references(name):
+    """ Count rows across all file fields that point at `name` """
+    return sum(
+        model._default_manager.filter(**{field.name: name}).count()
+        for model, field in file_fields()
+    )
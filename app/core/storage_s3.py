@@ -0,0 +1,40 @@
+"""
+S3 media storage
+
+Kept apart from core.storage so boto3 is only imported when
+DEFAULT_FILE_STORAGE points here.
+"""
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from core.storage import ContentAddressedStorageMixin
+
+
+class ContentAddressedS3Storage(ContentAddressedStorageMixin,
+                                S3Boto3Storage):
+    """ Deduplicated media in an S3 compatible bucket """
+
+    def touch(self, name):
+        """
+        Copy the object onto itself to refresh LastModified, S3 has no
+        other way. Replacing the metadata is what makes the copy legal,
+        so the current headers and the ACL are passed along.
+        """
+        key = self._normalize_name(clean_name(name))
+        obj = self.bucket.Object(key)
+        obj.load()
+
+        params = {'Metadata': obj.metadata}
+        for param, value in [
+            ('ContentType', obj.content_type),
+            ('ContentEncoding', obj.content_encoding),
+            ('CacheControl', obj.cache_control),
+            ('ACL', self.default_acl),
+        ]:
+            if value:
+                params[param] = value
+        obj.copy_from(
+            CopySource={'Bucket': self.bucket_name, 'Key': key},
+            MetadataDirective='REPLACE',
+            **params,
+        )
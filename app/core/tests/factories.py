@@ -0,0 +1,51 @@
+"""
+Factory helpers shared by the test suites
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+)
+
+
+def create_user(email='user@example.com', password='Password123', **params):
+    """ Create and return a new user """
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password,
+        **params,
+    )
+
+
+def create_superuser(email='admin@example.com', password='Password123'):
+    """ Create and return a new superuser """
+    return get_user_model().objects.create_superuser(email, password)
+
+
+def create_recipe(user, **params):
+    """ Create and return a sample recipe """
+    defaults = {
+        'title': 'Sample Recipe Title',
+        'time_minutes': 22,
+        'price': Decimal('1.00'),
+        'description': 'Sample Description',
+        'link': 'http://example.com/recipe.pdf',
+    }
+    """ Overwrite dictionary with provided params """
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_tag(user, name='Sample Tag'):
+    """ Create and return a tag """
+    return Tag.objects.create(user=user, name=name)
+
+
+def create_ingredient(user, name='Sample Ingredient'):
+    """ Create and return an ingredient """
+    return Ingredient.objects.create(user=user, name=name)
@@ -3,27 +3,31 @@ Tests for Django Admin Modifications
 """
 
 from django.test import TestCase, Client
-from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.tests.factories import create_superuser, create_user
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django Admin"""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Create superuser and user"""
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+        cls.admin_user = create_superuser(
             email='admin@example.com',
             password='password123',
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = create_user(
             email='user@example.com',
             password='password123',
             name='Test User'
         )
 
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
     def test_users_listed(self):
         """Test that users are listed on page"""
         url = reverse('admin:core_user_changelist')
@@ -1,37 +1,135 @@
 """
 Test custom Django management commands
 """
-
-from unittest.mock import patch
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch, call
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import storage
 
 
 # patch mocks behaviour of db
-@patch('core.management.commands.wait_for_db.Command.check')
+@patch('core.management.commands.wait_for_db.Command.probe')
 class CommandTests(SimpleTestCase):
     """Test Commands"""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for db """
-        patched_check.return_value = True
+        patched_probe.return_value = None
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', stdout=StringIO())
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with()
 
     """ Test behaviour if DB is not ready """
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for DB when getting operational error"""
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_probe.side_effect = [Psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 6)
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_probe):
+        """Test delay between attempts doubles up to the cap"""
+        patched_probe.side_effect = [OperationalError] * 8 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        patched_sleep.assert_has_calls([
+            call(0.1), call(0.2), call(0.4), call(0.8), call(1.6),
+            call(3.2), call(5), call(5),
+        ])
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        """Test giving up once the timeout would be exceeded"""
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0.5, stdout=StringIO())
+
+
+@patch('core.management.commands.bootstrap.call_command')
+class BootstrapCommandTests(TestCase):
+    """Test the startup pipeline"""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.static_root)
+
+    def _bootstrap(self):
+        with override_settings(STATIC_ROOT=self.static_root):
+            call_command('bootstrap', stdout=StringIO())
+
+    def test_collectstatic_skipped_when_unchanged(self, patched_call):
+        """Test collectstatic only runs when static sources change"""
+        self._bootstrap()
+        self._bootstrap()
+
+        collect_calls = [
+            c for c in patched_call.call_args_list
+            if c.args[0] == 'collectstatic'
+        ]
+        self.assertEqual(len(collect_calls), 1)
+
+    def test_collectstatic_runs_when_storage_changes(self, patched_call):
+        """Test a new storage class or brotli reruns collectstatic"""
+        self._bootstrap()
+        with override_settings(
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.'
+                                'ManifestStaticFilesStorage',
+        ):
+            self._bootstrap()
+        with patch('core.storage.brotli', None if storage.brotli else True):
+            self._bootstrap()
+
+        collect_calls = [
+            c for c in patched_call.call_args_list
+            if c.args[0] == 'collectstatic'
+        ]
+        self.assertEqual(len(collect_calls), 3)
+
+    def test_upload_temp_dir_created(self, patched_call):
+        """Test a missing FILE_UPLOAD_TEMP_DIR is created"""
+        temp_dir = os.path.join(self.static_root, 'tmp')
+
+        with override_settings(FILE_UPLOAD_TEMP_DIR=temp_dir):
+            self._bootstrap()
+
+        self.assertTrue(os.path.isdir(temp_dir))
+
+    @patch('core.management.commands.bootstrap.pending_migrations')
+    def test_migrate_skipped_when_applied(self, patched_pending, patched_call):
+        """Test migrate is not run without unapplied migrations"""
+        patched_pending.return_value = []
+
+        self._bootstrap()
+
+        commands = [c.args[0] for c in patched_call.call_args_list]
+        self.assertNotIn('migrate', commands)
+
+    @patch('core.management.commands.bootstrap.pending_migrations')
+    def test_migrate_runs_when_pending(self, patched_pending, patched_call):
+        """Test migrate runs under the lock when migrations are pending"""
+        patched_pending.return_value = ['0001_initial']
 
-        call_command('wait_for_db')
+        self._bootstrap()
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        commands = [c.args[0] for c in patched_call.call_args_list]
+        self.assertIn('migrate', commands)
+        self.assertEqual(patched_pending.call_count, 2)
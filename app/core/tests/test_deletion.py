@@ -0,0 +1,145 @@
+"""
+Tests for chunked deletion
+"""
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import deletion
+from core.models import (
+    CatalogName,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeStats,
+    Tag,
+    Tombstone,
+)
+from core.tests.factories import (
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user,
+)
+
+
+class DeletionTests(TestCase):
+    """ Test raw chunked deletes keep the bookkeeping right """
+
+    def setUp(self):
+        self.user = create_user()
+        self.tag = create_tag(self.user)
+        self.ingredient = create_ingredient(self.user)
+
+    def recipe(self, user=None, image=None):
+        recipe = create_recipe(user or self.user)
+        if user is None:
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+        if image is not None:
+            recipe.image.save('photo.jpg', ContentFile(image))
+        return recipe
+
+    def test_delete_recipes_in_chunks(self):
+        """ Test only the chosen recipes go, with tombstones and stats """
+        recipes = [self.recipe() for _ in range(5)]
+        kept = recipes.pop()
+        other = self.recipe(user=create_user(email='other@example.com'))
+
+        deleted = deletion.delete_recipes(
+            self.user.id,
+            recipe_ids=[r.id for r in recipes] + [other.id],
+            chunk_size=2,
+        )
+
+        self.assertEqual(deleted, 4)
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True).order_by('id')),
+            [kept.id, other.id],
+        )
+        self.assertEqual(
+            RecipeIngredient.objects.filter(recipe__user=self.user).count(),
+            1,
+        )
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(
+                kind=Tombstone.RECIPE,
+            ).values_list('object_id', flat=True)),
+            [r.id for r in recipes],
+        )
+        stats = RecipeStats.objects.get(user=self.user)
+        self.assertEqual(stats.recipe_count, 1)
+        self.assertEqual(stats.tag_counts, {str(self.tag.id): 1})
+
+    def test_on_chunk_called_per_chunk(self):
+        """ Test the callback runs after every chunk, for lease renewal """
+        recipes = [self.recipe() for _ in range(5)]
+        chunks = []
+
+        deletion.delete_recipes(
+            self.user.id,
+            [r.id for r in recipes],
+            chunk_size=2,
+            on_chunk=lambda: chunks.append(1),
+        )
+
+        self.assertEqual(len(chunks), 3)
+
+    def test_change_lock_taken_before_row_locks(self):
+        """ Test the lock order matches save(), so the two cannot deadlock """
+        recipe = self.recipe()
+
+        with CaptureQueriesContext(connection) as queries:
+            deletion.delete_recipes(self.user.id, [recipe.id])
+
+        statements = [q['sql'] for q in queries.captured_queries]
+        lock = next(
+            i for i, sql in enumerate(statements)
+            if 'pg_advisory_xact_lock' in sql
+        )
+        row_lock = next(
+            i for i, sql in enumerate(statements) if 'FOR UPDATE' in sql
+        )
+        self.assertLess(lock, row_lock)
+
+    def test_images_left_for_gc(self):
+        """ Test files are not deleted inline, gc_media collects them """
+        alone = self.recipe(image=b'alone')
+
+        deletion.delete_recipes(self.user.id, [alone.id])
+
+        self.assertTrue(default_storage.exists(alone.image.name))
+
+    def test_delete_user(self):
+        """ Test a user and everything they own are deleted """
+        recipe = self.recipe(image=b'photo')
+        deletion.delete_recipes(self.user.id, [self.recipe().id])
+        other = create_user(email='other@example.com')
+        other_recipe = self.recipe(user=other)
+        create_tag(other, name=self.tag.name)
+
+        deleted = deletion.delete_user(self.user, chunk_size=1)
+
+        self.assertEqual(deleted, {
+            'recipes': 1,
+            'tags': 1,
+            'ingredients': 1,
+            'tombstones': 1,
+            'names': 1,
+        })
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertEqual(list(Recipe.objects.all()), [other_recipe])
+        self.assertEqual(Tag.objects.get().user, other)
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertTrue(CatalogName.objects.filter(
+            id=self.tag.catalog_id,
+        ).exists())
+        self.assertFalse(CatalogName.objects.filter(
+            id=self.ingredient.catalog_id,
+        ).exists())
@@ -1,13 +1,20 @@
 """
 Tests for health check API
 """
+import threading
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import connections
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import health
+
+READY_URL = reverse('health-ready')
+
 
 class HealthCheckStatus(TestCase):
     """ Test the Health Check API """
@@ -19,3 +26,89 @@ class HealthCheckStatus(TestCase):
         res = client.get(url)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_liveness_alias(self):
+        """ Test liveness answers without touching the database """
+        with self.assertNumQueries(0):
+            res = APIClient().get(reverse('health-live'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(HEALTH_CHECK_CACHE_SECONDS=0)
+class ReadinessTests(TestCase):
+    """ Test the readiness checks """
+
+    def setUp(self):
+        health.last['at'] = None
+        self.client = APIClient()
+
+    def test_ready_with_timings(self):
+        """ Test every dependency reports ok with a latency """
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['ready'])
+        self.assertEqual(
+            set(res.data['checks']),
+            {'database', 'cache', 'media'},
+        )
+        for check in res.data['checks'].values():
+            self.assertTrue(check['ok'])
+            self.assertGreaterEqual(check['ms'], 0)
+
+    def test_failing_dependency_unavailable(self):
+        """ Test one failing check makes the worker unready """
+        def broken():
+            raise OSError('read-only file system')
+
+        with patch.dict(health.CHECKS, {'media': broken}):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(res.data['ready'])
+        self.assertEqual(res.data['checks']['media'], {
+            'ok': False,
+            'error': 'read-only file system',
+        })
+        self.assertTrue(res.data['checks']['database']['ok'])
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05)
+    def test_hung_dependency_times_out(self):
+        """ Test a check that never answers fails after the timeout """
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with patch.dict(health.CHECKS, {'cache': release.wait}):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('timed out', res.data['checks']['cache']['error'])
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=1.5)
+    def test_database_probe_bounded(self):
+        """ Test the probe connects and queries under the timeout """
+        wrapper = connections['default']
+        with patch.object(
+            wrapper,
+            'get_new_connection',
+            wraps=wrapper.get_new_connection,
+        ) as connect:
+            health.check_database()
+
+        params = connect.call_args.args[0]
+        self.assertEqual(params['connect_timeout'], 2)
+        self.assertIn('-c statement_timeout=1500', params['options'])
+
+    @override_settings(HEALTH_CHECK_CACHE_SECONDS=60)
+    def test_result_cached(self):
+        """ Test repeated probes reuse the last result """
+        with patch.object(
+            health,
+            'run_checks',
+            return_value=(True, {}),
+        ) as run_checks:
+            self.client.get(READY_URL)
+            self.client.get(READY_URL)
+
+        run_checks.assert_called_once()
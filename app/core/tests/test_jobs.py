@@ -0,0 +1,182 @@
+"""
+Tests for the background job queue
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+def succeed(job):
+    return {'echo': job.payload['value']}
+
+
+def fail(job):
+    raise RuntimeError('boom')
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_VISIBILITY_TIMEOUT=60)
+@patch.dict(jobs.registry, {'test.succeed': succeed, 'test.fail': fail})
+class JobQueueTests(TestCase):
+    """ Test enqueueing, claiming and running jobs """
+
+    def test_run_job_success(self):
+        """ Test a successful job stores its result """
+        job = jobs.enqueue('test.succeed', value=42)
+
+        ran = jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(ran, 1)
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'echo': 42})
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_job_retried_with_backoff(self):
+        """ Test a failing job is requeued with a growing delay """
+        job = jobs.enqueue('test.fail')
+
+        jobs.run_pending()
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        delay = job.run_after - timezone.now()
+        self.assertGreater(delay, timedelta(seconds=9))
+        """ not ready yet, so nothing else runs """
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        delay = job.run_after - timezone.now()
+        self.assertGreater(delay, timedelta(seconds=19))
+
+    def test_job_fails_after_max_attempts(self):
+        """ Test a job is marked failed once attempts run out """
+        job = jobs.enqueue('test.fail', max_attempts=1)
+
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_unknown_job_fails(self):
+        """ Test a job without a handler is not run """
+        job = jobs.enqueue('test.missing', max_attempts=1)
+
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('No handler', job.last_error)
+
+    def test_schedule_shares_queued_job(self):
+        """ Test scheduling while a job waits queues no second one """
+        first = jobs.schedule('test.succeed', 60, value=1)
+
+        second = jobs.schedule('test.succeed', 60, value=2)
+
+        self.assertIsNone(second)
+        self.assertEqual(Job.objects.get(), first)
+        self.assertGreater(first.run_after, timezone.now())
+
+    def test_gc_media_job(self):
+        """ Test the media.gc job runs gc_media """
+        job = jobs.enqueue('media.gc')
+
+        def gc_media(name, stdout):
+            stdout.write('Deleted 2 orphaned files\n')
+
+        with patch('recipe.jobs.call_command', side_effect=gc_media):
+            jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE, job.last_error)
+        self.assertEqual(job.result, {'output': 'Deleted 2 orphaned files'})
+
+    def test_claimed_job_invisible_until_timeout(self):
+        """ Test a running job is reclaimed after its visibility timeout """
+        job = jobs.enqueue('test.succeed', value=1)
+
+        self.assertEqual(jobs.claim(), [job])
+        self.assertEqual(jobs.claim(), [])
+
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        reclaimed = jobs.claim()
+
+        self.assertEqual(reclaimed, [job])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_expired_job_out_of_attempts_fails(self):
+        """ Test a job whose worker died on its last attempt is not rerun """
+        job = jobs.enqueue('test.succeed', value=1, max_attempts=2)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            attempts=2,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        self.assertEqual(jobs.claim(), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(job.locked_until)
+
+    def test_heartbeat_extends_lease(self):
+        """ Test a heartbeat keeps a long job from being reclaimed """
+        job = jobs.enqueue('test.succeed', value=1)
+        [claimed] = jobs.claim()
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() + timedelta(seconds=1),
+        )
+
+        jobs.heartbeat(claimed)
+
+        job.refresh_from_db()
+        self.assertGreater(
+            job.locked_until,
+            timezone.now() + timedelta(seconds=50),
+        )
+
+    def test_run_workers_burst(self):
+        """ Test run_workers drains the queue and exits in burst mode """
+        jobs.enqueue('test.succeed', value=1)
+        jobs.enqueue('test.succeed', value=2)
+
+        call_command('run_workers', processes=1, burst=True,
+                     stdout=StringIO())
+
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+
+    @patch('core.management.commands.run_workers.connections')
+    @patch('core.management.commands.run_workers.time.sleep')
+    @patch('core.jobs.claim')
+    def test_run_workers_survive_database_errors(self, patched_claim,
+                                                 patched_sleep, _):
+        """ Test a failing poll is retried with backoff, not fatal """
+        patched_claim.side_effect = [
+            OperationalError('server closed the connection'),
+            OperationalError('server closed the connection'),
+            [],
+        ]
+
+        with self.assertLogs('core.management.commands.run_workers'):
+            call_command('run_workers', processes=1, burst=True,
+                         poll_interval=1, stdout=StringIO())
+
+        self.assertEqual(patched_claim.call_count, 3)
+        self.assertEqual(
+            [c.args[0] for c in patched_sleep.call_args_list],
+            [1, 2],
+        )
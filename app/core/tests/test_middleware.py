@@ -0,0 +1,64 @@
+"""
+Tests for middleware
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests.factories import create_user
+
+HEALTH_CHECK_URL = reverse('health-check')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class APIMiddlewareTests(TestCase):
+    """ Test browser middleware is skipped for API routes """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def test_api_request_skips_session_and_messages(self):
+        """ Test API requests get no session or message storage """
+        res = self.client.get(HEALTH_CHECK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+        self.assertFalse(hasattr(res.wsgi_request, '_messages'))
+        self.assertNotIn('Cookie', res.get('Vary', ''))
+
+    def test_token_auth_sets_user(self):
+        """ Test API views still see the token authenticated user """
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self._token()}'
+        )
+
+        res = client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.wsgi_request.user, self.user)
+
+    def test_session_login_ignored_by_api(self):
+        """ Test an admin session does not authenticate API requests """
+        self.client.force_login(self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_admin_keeps_session(self):
+        """ Test non API routes still load the session """
+        res = self.client.get(reverse('admin:login'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(hasattr(res.wsgi_request, 'session'))
+
+    def _token(self):
+        res = APIClient().post(
+            reverse('user:token'),
+            {'email': 'user@example.com', 'password': 'Password123'},
+        )
+        return res.data['token']
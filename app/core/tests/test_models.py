@@ -2,6 +2,7 @@
 Tests for Models
 """
 
+from django.db import transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -78,6 +79,68 @@ class ModelTests(TestCase):
         """ Compare string representation of recipe object """
         self.assertEqual(str(recipe), recipe.title)
 
+    def test_tag_names_share_catalog_entry(self):
+        """ Test equal names across users share one entry """
+        user1 = create_user()
+        user2 = create_user(email='other@example.com')
+
+        tag1 = models.Tag.objects.create(user=user1, name='Sea Salt')
+        tag2 = models.Tag.objects.create(user=user2, name='Sea Salt')
+        ingredient = models.Ingredient.objects.create(
+            user=user1,
+            name='Sea Salt',
+        )
+
+        self.assertEqual(tag1.catalog, tag2.catalog)
+        self.assertEqual(tag1.catalog, ingredient.catalog)
+        self.assertEqual(models.CatalogName.objects.count(), 1)
+
+    def test_spellings_keep_own_entry(self):
+        """ Test each spelling is kept, grouped under one key """
+        tag1 = models.Tag.objects.create(user=create_user(), name='Sea Salt')
+        tag2 = models.Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name=' sea  SALT',
+        )
+
+        tag2.refresh_from_db()
+        self.assertNotEqual(tag1.catalog, tag2.catalog)
+        self.assertEqual(tag1.catalog.key, tag2.catalog.key)
+        self.assertEqual(tag2.name, ' sea  SALT')
+
+    def test_renaming_tag_relinks_catalog(self):
+        """ Test changing a name points the tag at the new entry """
+        tag = models.Tag.objects.create(user=create_user(), name='Lunch')
+
+        tag.name = 'Dinner'
+        tag.save(update_fields=['name'])
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.catalog.key, 'dinner')
+        self.assertEqual(tag.name, 'Dinner')
+
+    def test_saving_stale_recipe_raises_conflict(self):
+        """ Test saving a recipe changed since it was read fails """
+        recipe = models.Recipe.objects.create(
+            user=create_user(),
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        stale = models.Recipe.objects.get(pk=recipe.pk)
+        recipe.title = 'Stew'
+        recipe.save()
+
+        stale.title = 'Broth'
+        with self.assertRaises(models.VersionConflict) as ctx:
+            with transaction.atomic():
+                stale.save()
+
+        self.assertEqual(ctx.exception.current, 2)
+        self.assertEqual(stale.version, 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Stew')
+
 
 def test_create_tag(self):
     """ Test creating a tag is successful """
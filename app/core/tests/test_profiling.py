@@ -0,0 +1,109 @@
+"""
+Tests for sampled request profiling
+"""
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import profiling
+from core.tests.factories import create_superuser, create_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PROFILES_URL = reverse('profile-list')
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0)
+class ProfilerMiddlewareTests(TestCase):
+    """ Test which requests are profiled and what is kept """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_signed_header_profiles_request(self):
+        """ Test a valid debug header captures call tree and SQL """
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_X_PROFILE=profiling.make_token(),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        profile = profiling.get_profile(res['X-Profile-Id'])
+        self.assertEqual(profile['path'], RECIPES_URL)
+        self.assertEqual(profile['status'], 200)
+        self.assertIn('core_recipe', ' '.join(
+            q['sql'] for q in profile['queries']
+        ))
+        self.assertIn('get_queryset', profile['call_tree'])
+
+    def test_bad_header_not_profiled(self):
+        """ Test a forged header is ignored """
+        res = self.client.get(RECIPES_URL, HTTP_X_PROFILE='profile:forged')
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(profiling.recent_profiles(), [])
+
+    @override_settings(PROFILER_SAMPLE_RATE=1, PROFILER_MAX_PROFILES=2)
+    def test_ring_buffer_keeps_newest(self):
+        """ Test only the last N sampled profiles are kept """
+        ids = [self.client.get(RECIPES_URL)['X-Profile-Id']
+               for _ in range(3)]
+
+        kept = [p['id'] for p in profiling.recent_profiles()]
+
+        self.assertEqual(kept, [ids[2], ids[1]])
+
+    @override_settings(PROFILER_ENABLED=False, PROFILER_SAMPLE_RATE=1)
+    def test_disabled_profiler_does_nothing(self):
+        """ Test nothing is profiled unless enabled """
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_X_PROFILE=profiling.make_token(),
+        )
+
+        self.assertNotIn('X-Profile-Id', res)
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=1)
+class ProfileAdminTests(TestCase):
+    """ Test the admin profile pages """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = create_superuser()
+        cls.user = create_user()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_profiles_require_staff(self):
+        """ Test non-staff users are sent to the admin login """
+        client = Client()
+        client.force_login(self.user)
+
+        res = client.get(PROFILES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertIn(reverse('admin:login'), res['Location'])
+
+    def test_profiles_listed_for_staff(self):
+        """ Test staff see captured profiles and their details """
+        api_client = APIClient()
+        api_client.force_authenticate(self.user)
+        profile_id = api_client.get(RECIPES_URL)['X-Profile-Id']
+        client = Client()
+        client.force_login(self.admin_user)
+
+        res = client.get(PROFILES_URL)
+        detail = client.get(reverse('profile-detail', args=[profile_id]))
+
+        self.assertContains(res, RECIPES_URL)
+        self.assertContains(detail, 'core_recipe')
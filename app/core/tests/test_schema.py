@@ -0,0 +1,104 @@
+"""
+Tests for the precomputed OpenAPI schema
+"""
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+
+
+@override_settings(SCHEMA_ARTIFACT='/nonexistent/schema.json')
+class SchemaViewTests(SimpleTestCase):
+    """ Test serving the schema """
+
+    def setUp(self):
+        schema._cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        schema._cache.clear()
+
+    def test_schema_generated_once(self):
+        """ Test repeated requests reuse the generated schema """
+        with patch(
+            'core.schema.generate_schema',
+            wraps=schema.generate_schema,
+        ) as patched_generate:
+            self.client.get(SCHEMA_URL)
+            res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'/api/recipe/recipes/', res.content)
+        patched_generate.assert_called_once()
+
+    def test_etag_not_modified(self):
+        """ Test matching If-None-Match returns 304 without a body """
+        res = self.client.get(SCHEMA_URL)
+        etag = res['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_etag_differs_per_format(self):
+        """ Test YAML and JSON representations have distinct ETags """
+        res_yaml = self.client.get(SCHEMA_URL)
+        res_json = self.client.get(
+            SCHEMA_URL,
+            HTTP_ACCEPT='application/vnd.oai.openapi+json',
+        )
+
+        self.assertEqual(res_json.status_code, status.HTTP_200_OK)
+        self.assertIn('openapi', json.loads(res_json.content))
+        self.assertNotEqual(res_yaml['ETag'], res_json['ETag'])
+
+
+class SchemaArtifactTests(SimpleTestCase):
+    """ Test the build_schema artifact """
+
+    def setUp(self):
+        schema._cache.clear()
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+    def tearDown(self):
+        schema._cache.clear()
+        os.remove(self.path)
+
+    def test_artifact_used_when_fingerprint_matches(self):
+        """ Test a current artifact is served without generating """
+        with open(os.devnull, 'w') as devnull:
+            call_command('build_schema', file=self.path, stdout=devnull)
+
+        with override_settings(SCHEMA_ARTIFACT=self.path), \
+                patch('core.schema.generate_schema') as patched_generate:
+            cached = schema.get_schema()
+
+        patched_generate.assert_not_called()
+        self.assertIn('/api/recipe/recipes/', cached.data['paths'])
+
+    def test_stale_artifact_ignored(self):
+        """ Test an artifact built from other source is regenerated """
+        with open(self.path, 'w') as f:
+            json.dump({'fingerprint': 'stale', 'schema': {}}, f)
+
+        with override_settings(SCHEMA_ARTIFACT=self.path), \
+                patch('core.schema.generate_schema') as patched_generate:
+            patched_generate.return_value = {'openapi': '3.0.3'}
+            cached = schema.get_schema()
+
+        patched_generate.assert_called_once()
+        self.assertEqual(cached.data, {'openapi': '3.0.3'})
@@ -0,0 +1,169 @@
+"""
+Tests for the slow query log
+"""
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Recipe
+from core.tests.factories import create_recipe, create_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+""" low enough that every query counts as slow """
+EVERYTHING = 1e-6
+
+
+class FingerprintTests(TestCase):
+    """ Test SQL normalization """
+
+    def test_literals_and_lists_collapsed(self):
+        """ Test queries differing only in values share a fingerprint """
+        first = slow_queries.fingerprint(
+            "SELECT * FROM t1 WHERE id IN (1, 2, 3) AND name = 'a''b'"
+        )
+        second = slow_queries.fingerprint(
+            'SELECT *  FROM t1\nWHERE id IN (%s) AND name = %s'
+        )
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first[0],
+            'SELECT * FROM t1 WHERE id IN (...) AND name = ?',
+        )
+
+    def test_only_reads_explained(self):
+        """ Test writes are never explained """
+        self.assertTrue(slow_queries.explainable(' SELECT 1'))
+        self.assertFalse(slow_queries.explainable('UPDATE t SET a = 1'))
+
+    def test_locking_and_volatile_reads_not_analyzed(self):
+        """ Test reads with side effects are not executed again """
+        volatile = {'nextval', 'random'}
+
+        self.assertTrue(slow_queries.analyzable(
+            "SELECT count(*) FROM t WHERE name = 'nextval(x)'", volatile,
+        ))
+        for sql in [
+            'SELECT * FROM t FOR UPDATE',
+            'SELECT * FROM t FOR SHARE',
+            'SELECT * FROM t FOR NO KEY UPDATE SKIP LOCKED',
+            'SELECT * FROM t for key share',
+            "SELECT nextval('core_change_seq')",
+            'SELECT RANDOM () FROM t',
+        ]:
+            self.assertFalse(slow_queries.analyzable(sql, volatile), sql)
+
+
+@override_settings(SLOW_QUERY_MS=EVERYTHING)
+class SlowQueryMiddlewareTests(TestCase):
+    """ Test slow queries are attributed, aggregated and explained """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        create_recipe(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def entry_for(self, table, verb='SELECT'):
+        for entry in slow_queries.report():
+            if entry['sql'].startswith(verb) and table in entry['sql']:
+                return entry
+        self.fail(f'No {verb} on {table} recorded')
+
+    def test_view_attributed_and_aggregated(self):
+        """ Test repeated queries aggregate under the viewset action """
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            for _ in range(2):
+                res = self.client.get(RECIPES_URL)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        entry = self.entry_for('"core_recipe"')
+        self.assertEqual(entry['count'], 2)
+        self.assertEqual(entry['origins'], {'RecipeViewSet.list': 2})
+        self.assertGreaterEqual(entry['total_ms'], entry['max_ms'])
+
+    def test_select_explained_once(self):
+        """ Test a sampled plan is kept for reads """
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            self.client.get(RECIPES_URL)
+
+        plan = self.entry_for('"core_recipe"')['explain']
+        self.assertIn('actual time', plan)
+        self.assertIn('Buffers', plan)
+
+    def test_write_not_explained(self):
+        """ Test inserts are recorded without running them again """
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(title='Soup').count(), 1)
+        entry = self.entry_for('"core_recipe"', verb='INSERT')
+        self.assertIsNone(entry['explain'])
+        self.assertEqual(entry['origins'], {'RecipeViewSet.create': 1})
+
+    def test_volatile_select_explained_without_running(self):
+        """ Test a sampled nextval() is not executed a second time """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT last_value FROM core_change_seq")
+            before = cursor.fetchone()[0]
+            with self.assertLogs('core.slow_queries', 'WARNING'), \
+                    slow_queries.slow_query_log('test'):
+                cursor.execute("SELECT nextval('core_change_seq')")
+            cursor.execute("SELECT last_value FROM core_change_seq")
+            after = cursor.fetchone()[0]
+
+        self.assertEqual(after, before + 1)
+        plan = self.entry_for('nextval')['explain']
+        self.assertIn('Result', plan)
+        self.assertNotIn('actual time', plan)
+
+    @override_settings(SLOW_QUERY_MAX_FINGERPRINTS=1)
+    def test_fingerprints_bounded(self):
+        """ Test only the newest fingerprints are kept """
+        slow_queries.record('a', 'SELECT a', 'x', 1.0)
+        slow_queries.record('b', 'SELECT b', 'x', 1.0)
+
+        self.assertEqual(
+            [entry['fingerprint'] for entry in slow_queries.report()],
+            ['b'],
+        )
+
+    def test_record_aggregates(self):
+        """ Test counters and origins add up across records """
+        slow_queries.record('a', 'SELECT a', 'x', 1.5)
+        slow_queries.record('a', 'SELECT a', 'y', 2.0)
+        slow_queries.record('a', 'SELECT a', 'x', 0.5, plan='Seq Scan')
+
+        entry, = slow_queries.report()
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(entry['total_ms'], 4.0)
+        self.assertEqual(entry['max_ms'], 2.0)
+        self.assertEqual(entry['origins'], {'x': 2, 'y': 1})
+        self.assertEqual(entry['explain'], 'Seq Scan')
+
+    def test_report_command(self):
+        """ Test the command prints aggregates and plans, then resets """
+        with self.assertLogs('core.slow_queries', 'WARNING'):
+            self.client.get(RECIPES_URL)
+        out = StringIO()
+
+        call_command('slow_queries', '--explain', '--reset', stdout=out)
+
+        self.assertIn('RecipeViewSet.list', out.getvalue())
+        self.assertIn('actual time', out.getvalue())
+        self.assertEqual(slow_queries.report(), [])
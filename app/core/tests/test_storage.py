@@ -0,0 +1,187 @@
+"""
+Tests for file storage backends
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.storage import CompressedManifestStaticFilesStorage
+from core.storage_s3 import ContentAddressedS3Storage
+from core.tests.factories import create_recipe, create_user
+
+
+class StaticFilesStorageTests(SimpleTestCase):
+    """ Test hashed and precompressed static files """
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.source_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.source_dir, 'site.css'), 'w') as f:
+            f.write('body { color: black; }\n' * 50)
+        with open(os.path.join(self.source_dir, 'tiny.css'), 'w') as f:
+            f.write('a {}\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.static_root)
+        shutil.rmtree(self.source_dir)
+
+    def _collectstatic(self):
+        with override_settings(
+            STATIC_ROOT=self.static_root,
+            STATICFILES_DIRS=[self.source_dir],
+        ):
+            call_command(
+                'collectstatic',
+                interactive=False,
+                stdout=StringIO(),
+            )
+            storage = CompressedManifestStaticFilesStorage()
+            return storage, storage.stored_name('site.css')
+
+    def test_hashed_names_with_gzip_variant(self):
+        """ Test collectstatic writes hashed files plus .gz copies """
+        storage, hashed = self._collectstatic()
+
+        self.assertRegex(hashed, r'^site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.static_root, hashed + '.gz'), 'rb') as f:
+            content = gzip.decompress(f.read())
+        self.assertEqual(content, b'body { color: black; }\n' * 50)
+
+    def test_small_files_not_compressed(self):
+        """ Test files too small to benefit are left alone """
+        storage, _ = self._collectstatic()
+
+        tiny = storage.stored_name('tiny.css')
+        self.assertFalse(storage.exists(tiny + '.gz'))
+
+    def test_unhashed_names_without_manifest(self):
+        """ Test URLs fall back to plain names before collectstatic """
+        with override_settings(STATIC_ROOT=self.static_root):
+            storage = CompressedManifestStaticFilesStorage()
+
+            url = storage.url('site.css')
+
+        self.assertEqual(url, '/static/static/site.css')
+
+
+class ContentAddressedStorageTests(TestCase):
+    """ Test deduplicated media storage and orphan collection """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _recipe(self, content):
+        recipe = create_recipe(self.user)
+        recipe.image.save('photo.JPG', ContentFile(content))
+        return recipe
+
+    def _age(self, name, seconds):
+        """ Backdate a stored file """
+        past = time.time() - seconds
+        os.utime(default_storage.path(name), (past, past))
+
+    def test_identical_content_stored_once(self):
+        """ Test equal uploads share one content-addressed file """
+        r1 = self._recipe(b'same bytes')
+        r2 = self._recipe(b'same bytes')
+        r3 = self._recipe(b'other bytes')
+
+        self.assertEqual(r1.image.name, r2.image.name)
+        self.assertNotEqual(r1.image.name, r3.image.name)
+        self.assertRegex(
+            r1.image.name,
+            r'^uploads/recipe/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$',
+        )
+        directory = os.path.dirname(default_storage.path(r1.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_gc_media_keeps_shared_file(self):
+        """ Test a file is only collected once its last reference goes """
+        r1 = self._recipe(b'shared')
+        r2 = self._recipe(b'shared')
+        name = r1.image.name
+        self._age(name, 7200)
+
+        r1.delete()
+        call_command('gc_media', grace=3600, stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+
+        r2.delete()
+        call_command('gc_media', grace=3600, stdout=StringIO())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_gc_media_deletes_old_orphans(self):
+        """ Test unreferenced files past the grace period are removed """
+        kept = self._recipe(b'kept').image.name
+        orphan = default_storage.save('uploads/recipe/a.jpg',
+                                      ContentFile(b'orphan'))
+        recent = default_storage.save('uploads/recipe/b.jpg',
+                                      ContentFile(b'recent'))
+        self._age(kept, 7200)
+        self._age(orphan, 7200)
+
+        call_command('gc_media', grace=3600, stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_dedup_refreshes_orphan(self):
+        """ Test re-uploading an orphan's content protects it from gc """
+        name = default_storage.save('uploads/recipe/a.jpg',
+                                    ContentFile(b'again'))
+        self._age(name, 7200)
+
+        default_storage.save('uploads/recipe/b.jpg', ContentFile(b'again'))
+        call_command('gc_media', grace=3600, stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+
+
+class S3StorageTests(SimpleTestCase):
+    """ Test the S3 backend keeps touched objects out of gc """
+
+    def test_touch_copies_object_in_place(self):
+        """ Test touch rewrites the object onto itself, keeping headers """
+        storage = ContentAddressedS3Storage(
+            bucket_name='media',
+            default_acl='public-read',
+        )
+        bucket = MagicMock()
+        obj = bucket.Object.return_value
+        obj.metadata = {}
+        obj.content_type = 'image/jpeg'
+        obj.content_encoding = None
+        obj.cache_control = 'public, max-age=31536000, immutable'
+
+        with patch.object(ContentAddressedS3Storage, 'bucket', bucket):
+            storage.touch('uploads/recipe/ab/ab.jpg')
+
+        bucket.Object.assert_called_once_with('uploads/recipe/ab/ab.jpg')
+        obj.copy_from.assert_called_once_with(
+            CopySource={'Bucket': 'media', 'Key': 'uploads/recipe/ab/ab.jpg'},
+            MetadataDirective='REPLACE',
+            Metadata={},
+            ContentType='image/jpeg',
+            CacheControl='public, max-age=31536000, immutable',
+            ACL='public-read',
+        )
@@ -0,0 +1,145 @@
+"""
+Tests for API rate limiting
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests.factories import create_user
+from core.throttling import SlidingWindowRateThrottle
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+
+TEST_RATES = {
+    'read': '3/min',
+    'write': '2/min',
+    'upload_image': '1/min',
+    'token': '2/min',
+}
+
+
+@patch.object(SlidingWindowRateThrottle, 'THROTTLE_RATES', TEST_RATES)
+class ThrottleTests(TestCase):
+    """ Test throttling of recipe and token endpoints """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_read_budget_exceeded(self):
+        """ Test reads over budget return 429 with Retry-After """
+        for _ in range(3):
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(res['Retry-After']), 1)
+
+    def test_read_budget_shared_across_endpoints(self):
+        """ Test recipe and tag reads draw from the same budget """
+        self.client.get(RECIPES_URL)
+        self.client.get(TAGS_URL)
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_write_budget_separate_from_reads(self):
+        """ Test exhausting reads does not block writes """
+        for _ in range(4):
+            self.client.get(RECIPES_URL)
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_budgets_are_per_user(self):
+        """ Test one user exhausting a budget does not affect another """
+        for _ in range(4):
+            self.client.get(RECIPES_URL)
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_token_requests_throttled(self):
+        """ Test token endpoint is limited per client """
+        client = APIClient()
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    def test_token_throttle_ignores_forwarded_for(self):
+        """ Test a spoofed X-Forwarded-For does not reset the budget """
+        client = APIClient()
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        for n in range(2):
+            res = client.post(
+                TOKEN_URL,
+                payload,
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{n}',
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = client.post(TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class SlidingWindowTests(TestCase):
+    """ Test the sliding window arithmetic """
+
+    def setUp(self):
+        cache.clear()
+
+    def _throttle(self, now):
+        throttle = SlidingWindowRateThrottle.__new__(SlidingWindowRateThrottle)
+        throttle.scope = 'test'
+        throttle.rate = '10/min'
+        throttle.num_requests, throttle.duration = 10, 60
+        throttle.timer = lambda: now
+        throttle.get_cache_key = lambda request, view: 'throttle:test:1'
+        return throttle
+
+    def test_previous_window_weighted(self):
+        """ Test requests from the previous window still count """
+        for _ in range(10):
+            self.assertTrue(self._throttle(59).allow_request(None, None))
+
+        """ 25% into next window, 75% of previous 10 still counts """
+        throttle = self._throttle(75)
+        allowed = sum(throttle.allow_request(None, None) for _ in range(5))
+
+        self.assertEqual(allowed, 2)
+        self.assertEqual(throttle.wait(), 3)
+
+    def test_rejected_requests_do_not_consume_budget(self):
+        """ Test requests over budget are not counted """
+        for _ in range(15):
+            self._throttle(30).allow_request(None, None)
+
+        self.assertEqual(cache.get('throttle:test:1:0'), 10)
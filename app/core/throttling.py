@@ -0,0 +1,118 @@
+"""
+Rate limiting for the API
+
+Counters live in the Django cache so every uWSGI worker shares the same
+budget. Each request costs one atomic increment, no history lists are
+read back and rewritten and nothing is written to the database.
+"""
+import math
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    Sliding window counter throttle
+
+    Requests are counted in fixed windows of `duration` seconds, the
+    previous window is weighted by how much of it still overlaps the
+    sliding window ending now.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_ident_key(self, request):
+        """ Identify the caller by user when authenticated, else by IP """
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+
+        return f'ip:{self.get_ident(request)}'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident_key(request),
+        }
+
+    def _incr(self, key):
+        """ Atomically increment the counter for a window """
+        """ add() is a no-op when the key exists, so this never resets """
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            """ key expired between add() and incr() """
+            self.cache.set(key, 1, self.duration * 2)
+            return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f'{self.key}:{window}'
+
+        self.current = self._incr(current_key)
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+
+        weighted = self.previous * (1 - self.elapsed) + self.current
+        if weighted > self.num_requests:
+            """ rejected requests do not consume budget """
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+
+        return True
+
+    def wait(self):
+        """ Seconds until the next request would be allowed """
+        remaining = self.duration * (1 - self.elapsed)
+        if self.current + 1 > self.num_requests or not self.previous:
+            """ only the next window can free up budget """
+            return math.ceil(remaining)
+
+        """ wait for the previous window's weight to decay enough """
+        overlap = (self.num_requests - self.current - 1) / self.previous
+        return max(1, math.ceil(remaining - overlap * self.duration))
+
+
+class RecipeAPIRateThrottle(SlidingWindowRateThrottle):
+    """
+    Separate budgets for reads, writes and image uploads
+
+    Scope is resolved per request, so rates are looked up from
+    DEFAULT_THROTTLE_RATES using `read`, `write` or `upload_image`.
+    """
+
+    def __init__(self):
+        """ Defer rate lookup until the scope is known """
+        pass
+
+    def get_scope(self, request, view):
+        if getattr(view, 'action', None) == 'upload_image':
+            return 'upload_image'
+        if request.method in SAFE_METHODS:
+            return 'read'
+
+        return 'write'
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        return super().allow_request(request, view)
+
+
+class TokenRateThrottle(SlidingWindowRateThrottle):
+    """ Limit token requests per client IP to slow credential guessing """
+    scope = 'token'
+
+    def get_ident_key(self, request):
+        return f'ip:{self.get_ident(request)}'
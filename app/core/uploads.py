@@ -0,0 +1,115 @@
+"""
+Streaming validation for image uploads
+
+The default handlers buffer small uploads in memory and the ImageField
+check opens the whole file again afterwards. ImageUploadHandler writes
+chunks straight to a temporary file, rejects the upload as soon as the
+magic bytes or the running size are wrong and reads only the image header
+to check its dimensions. Saving the result to FileSystemStorage is then a
+rename when FILE_UPLOAD_TEMP_DIR is on the media volume.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+
+""" leading bytes of each accepted format, None matches any byte """
+IMAGE_SIGNATURES = {
+    'JPEG': [b'\xff\xd8\xff'],
+    'PNG': [b'\x89PNG\r\n\x1a\n'],
+    'GIF': [b'GIF87a', b'GIF89a'],
+    'WEBP': [b'RIFF', None, None, None, None, b'WEBP'],
+}
+HEADER_SIZE = 12
+
+
+def sniff_image_format(header):
+    """ Return the image format the header bytes belong to, or None """
+    for image_format, parts in IMAGE_SIGNATURES.items():
+        offset = 0
+        for part in parts:
+            if part is None:
+                offset += 1
+                continue
+            if header[offset:offset + len(part)] != part:
+                break
+            offset += len(part)
+        else:
+            return image_format
+
+    return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """ Stream image uploads to disk, validating them on the way """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+
+    def reject(self, message):
+        """ Discard the partial upload and fail the request """
+        if getattr(self, 'file', None) is not None:
+            self.file.close()
+        raise ValidationError({self.field_name: [message]})
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        """ Refuse bodies that cannot fit before reading any of them """
+        """ allow some room for the multipart framing and other fields """
+        if content_length > self.max_size + 64 * 1024:
+            self.field_name = 'image'
+            self.reject('Image file too large.')
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.size = 0
+        self.header = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.reject('Image file too large.')
+
+        if len(self.header) < HEADER_SIZE:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+            if (len(self.header) == HEADER_SIZE
+                    and sniff_image_format(self.header) is None):
+                self.reject('Unsupported image type.')
+
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if sniff_image_format(self.header) is None:
+            self.reject('Unsupported image type.')
+
+        """ Image.open parses the header only, pixels are not decoded """
+        self.file.seek(0)
+        formats = list(IMAGE_SIGNATURES)
+        try:
+            with Image.open(self.file, formats=formats) as image:
+                width, height = image.size
+                image_format = image.format
+        except (UnidentifiedImageError, Image.DecompressionBombError,
+                OSError):
+            self.reject('Upload a valid image.')
+        if width * height > self.max_pixels:
+            self.reject('Image dimensions too large.')
+
+        upload = super().file_complete(file_size)
+        upload.content_type = Image.MIME[image_format]
+        upload.image_size = (width, height)
+        return upload
+
+
+class ImageUploadParser(MultiPartParser):
+    """ Multipart parser that streams files through ImageUploadHandler """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        """ first handler to accept a chunk keeps it from the others """
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+
+        return super().parse(stream, media_type, parser_context)
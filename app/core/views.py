@@ -1,12 +1,109 @@
 """
 Core views for app
 """
+from django.conf import settings
+from django.contrib import admin
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 
-from rest_framework.decorators import api_view
+from drf_spectacular.utils import extend_schema, inline_serializer
+from drf_spectacular.views import SpectacularAPIView
+
+from rest_framework import serializers, status
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
 from rest_framework.response import Response
 
+from core import health, profiling, schema
+
 
+@extend_schema(responses=inline_serializer(
+    'Liveness',
+    {'healthy': serializers.BooleanField()},
+))
 @api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
 def health_check(request):
-    """ Return successful response """
+    """ Liveness, the process answers, touches no dependency """
     return Response({'healthy': True})
+
+
+READINESS_RESPONSE = inline_serializer('Readiness', {
+    'ready': serializers.BooleanField(),
+    'checks': serializers.DictField(child=serializers.DictField()),
+})
+
+
+@extend_schema(responses={
+    200: READINESS_RESPONSE,
+    503: READINESS_RESPONSE,
+})
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
+def readiness_check(request):
+    """ Readiness, every dependency answers in time, with timings """
+    ready, checks = health.readiness()
+    return Response(
+        {'ready': ready, 'checks': checks},
+        status=status.HTTP_200_OK if ready
+        else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+class SchemaView(SpectacularAPIView):
+    """ Serve the precomputed OpenAPI schema with ETag validation """
+
+    def _get_schema_response(self, request):
+        version = (
+            self.api_version
+            or request.version
+            or self._get_version_parameter(request)
+        )
+        renderer = request.accepted_renderer
+        content, etag = schema.get_schema(version).render(renderer)
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type += f'; charset={renderer.charset}'
+            response = HttpResponse(content, content_type=content_type)
+            filename = self._get_filename(request, version)
+            response['Content-Disposition'] = f'inline; filename="{filename}"'
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def profile_list(request):
+    """ Admin page listing the most recent request profiles """
+    return render(request, 'core/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': profiling.recent_profiles(),
+        'header': settings.PROFILER_HEADER,
+        'token': profiling.make_token(),
+        'enabled': settings.PROFILER_ENABLED,
+    })
+
+
+def profile_detail(request, profile_id):
+    """ Admin page showing one profile's call tree and SQL """
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise Http404('Profile no longer in the buffer')
+
+    return render(request, 'core/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f"{profile['method']} {profile['path']}",
+        'profile': profile,
+    })
@@ -0,0 +1,130 @@
+"""
+Background jobs for recipes
+"""
+import json
+import os
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework.utils.encoders import JSONEncoder
+
+from core import deletion
+from core.jobs import enqueue, heartbeat, job, schedule
+from core.models import Recipe
+from core.storage import PrivateFileSystemStorage
+from recipe import serializers
+
+
+""" EXIF tag recording how the camera was held """
+EXIF_ORIENTATION = 0x0112
+
+
+@job('recipe.process_image')
+def process_image(job):
+    """ Apply EXIF rotation and shrink oversized uploads """
+    recipe = Recipe.objects.get(pk=job.payload['recipe_id'])
+    if not recipe.image or recipe.image.name != job.payload['image']:
+        """ image was replaced or removed since the job was queued """
+        return {'skipped': True}
+
+    max_size = settings.RECIPE_IMAGE_MAX_DIMENSION
+    with recipe.image.open('rb') as f:
+        image = Image.open(f)
+        image_format = image.format
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+        if not rotated and max(image.size) <= max_size:
+            return {'changed': False}
+        processed = ImageOps.exif_transpose(image)
+        processed.thumbnail((max_size, max_size))
+        output = BytesIO()
+        processed.save(output, format=image_format)
+
+    """ the original stays until gc_media finds it unreferenced """
+    recipe.image.save(
+        os.path.basename(recipe.image.name),
+        ContentFile(output.getvalue()),
+        save=False,
+    )
+    recipe.save(update_fields=['image'])
+
+    return {'changed': True, 'size': list(processed.size)}
+
+
+@job('recipe.import')
+def import_recipes(job):
+    """ Create recipes from a list of recipe payloads """
+    serializer = serializers.RecipeDetailSerializer(
+        data=job.payload['recipes'],
+        many=True,
+        context={'user': job.user},
+    )
+    serializer.is_valid(raise_exception=True)
+    with transaction.atomic():
+        recipes = serializer.save(user=job.user)
+
+    return {'created': [recipe.id for recipe in recipes]}
+
+
+@job('recipe.export')
+def export_recipes(job):
+    """
+    Write all of a user's recipes to a JSON file in private storage,
+    downloaded through the job and deleted after EXPORT_TTL
+    """
+    recipes = Recipe.objects.filter(
+        user=job.user,
+    ).with_links().order_by('id')
+    data = serializers.RecipeDetailSerializer(recipes, many=True).data
+    content = json.dumps(data, cls=JSONEncoder).encode()
+
+    name = PrivateFileSystemStorage().save(
+        f'exports/{uuid.uuid4()}.json',
+        ContentFile(content),
+    )
+    expires_at = timezone.now() + timedelta(seconds=settings.EXPORT_TTL)
+    """ not owned by the user, the file goes even if the user does """
+    enqueue('recipe.expire_export', run_after=expires_at, file=name)
+
+    return {
+        'file': name,
+        'url': reverse('recipe:job-download', args=[job.id]),
+        'expires_at': expires_at.isoformat(),
+    }
+
+
+@job('recipe.expire_export')
+def expire_export(job):
+    """ Delete an export file once its download window has passed """
+    PrivateFileSystemStorage().delete(job.payload['file'])
+
+    return {'deleted': job.payload['file']}
+
+
+@job('recipe.delete')
+def delete_recipes(job):
+    """ Delete many of a user's recipes, chunk by chunk """
+    deleted = deletion.delete_recipes(
+        job.user_id,
+        recipe_ids=job.payload['recipe_ids'],
+        on_chunk=lambda: heartbeat(job),
+    )
+    schedule('media.gc', settings.MEDIA_GC_DELAY)
+
+    return {'deleted': deleted}
+
+
+@job('media.gc')
+def gc_media(job):
+    """ Delete media files no row refers to any more, see gc_media """
+    output = StringIO()
+    call_command('gc_media', stdout=output)
+
+    return {'output': output.getvalue().splitlines()[-1]}
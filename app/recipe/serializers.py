@@ -2,16 +2,24 @@
 Serializers for recipe APIs
 """
 
+from django.db import transaction
 from rest_framework import serializers
+from core import similarity
 from core.models import (
+    CatalogName,
     Recipe,
+    RecipeIngredient,
     Tag,
     Ingredient,
+    Tombstone,
+    Job,
+    normalize_name,
 )
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     """ Serializer for Ingredients """
+    name = serializers.CharField(max_length=255)
 
     class Meta:
         model = Ingredient
@@ -19,8 +27,20 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    """ Serializer for an ingredient and its amount in a recipe """
+    id = serializers.IntegerField(source='ingredient.id', read_only=True)
+    name = serializers.CharField(source='ingredient.name', max_length=255)
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ['id', 'name', 'quantity', 'unit']
+        extra_kwargs = {'quantity': {'min_value': 0}}
+
+
 class TagSerializer(serializers.ModelSerializer):
     """ Serializer for tags """
+    name = serializers.CharField(max_length=255)
 
     class Meta:
         model = Tag
@@ -31,7 +51,13 @@ class TagSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     """ Serializer for recipes """
     tags = TagSerializer(many=True, required=False)
-    ingredients = IngredientSerializer(many=True, required=False)
+    ingredients = RecipeIngredientSerializer(
+        source='ingredient_amounts',
+        many=True,
+        required=False,
+    )
+    """ the version read, sent back with an update to detect conflicts """
+    version = serializers.IntegerField(required=False, min_value=1)
 
     class Meta:
         model = Recipe
@@ -42,66 +68,100 @@ class RecipeSerializer(serializers.ModelSerializer):
             'price',
             'link',
             'tags',
-            'ingredients'
+            'ingredients',
+            'version',
         ]
         read_only_fields = ['id']
 
     """ BEST PRACTICE - naming_[methodName] = internal method
     only used inside Recipe Serializer """
 
+    def _auth_user(self):
+        """ User from the request, or passed in by a background job """
+        if 'user' in self.context:
+            return self.context['user']
+
+        return self.context['request'].user
+
+    def _get_or_create_named(self, model, data):
+        """ Find the user's object by catalog key, or create it """
+        auth_user = self._auth_user()
+
+        """ matched on the normalized key, 'Salt' and 'salt ' are one tag """
+        obj = model.objects.filter(
+            user=auth_user,
+            catalog__key=normalize_name(data['name']),
+        ).order_by('id').first()
+        if obj is None:
+            obj = model.objects.create(user=auth_user, **data)
+        return obj
+
     def _get_or_create_tags(self, tags, recipe):
         """ Handle getting or creating tags as needed """
 
-        """ get authenticated user """
-        auth_user = self.context['request'].user
-
         """ loop add or find tags (don't add duplicates), with auth user """
         for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
+            tag_obj = self._get_or_create_named(Tag, tag)
             recipe.tags.add(tag_obj)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """ Handle getting or creating ingredients as needed """
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, create = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
+        for amount in ingredients:
+            ingredient_obj = self._get_or_create_named(
+                Ingredient,
+                amount['ingredient'],
             )
-            recipe.ingredients.add(ingredient_obj)
+            recipe.ingredients.add(ingredient_obj, through_defaults={
+                'quantity': amount.get('quantity'),
+                'unit': amount.get('unit', ''),
+            })
 
     def create(self, validated_data):
         """ Overwrite default method to allow adding of tags """
 
         """ remove tags from object and assign to variable """
         tags = validated_data.pop('tags', [])
-        ingredients = validated_data.pop('ingredients', [])
+        ingredients = validated_data.pop('ingredient_amounts', [])
+        validated_data.pop('version', None)
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_ingredients(ingredients, recipe)
-        self._get_or_create_tags(tags, recipe)
+        """ sign the recipe once, not once per added link """
+        with similarity.batch():
+            self._get_or_create_ingredients(ingredients, recipe)
+            self._get_or_create_tags(tags, recipe)
 
         return recipe
 
     def update(self, instance, validated_data):
-        """ Update Recipe """
+        """
+        Update Recipe, writing only the columns that changed. The save is
+        conditional on the version, on a conflict the link changes roll
+        back with it.
+        """
         tags = validated_data.pop('tags', None)
-        ingredients = validated_data.pop('ingredients', None)
+        ingredients = validated_data.pop('ingredient_amounts', None)
+        expected_version = validated_data.pop('version', None)
 
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+        with transaction.atomic():
+            with similarity.batch():
+                if tags is not None:
+                    instance.tags.clear()
+                    self._get_or_create_tags(tags, instance)
 
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+                if ingredients is not None:
+                    instance.ingredients.clear()
+                    self._get_or_create_ingredients(ingredients, instance)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            changed = [
+                attr for attr, value in validated_data.items()
+                if getattr(instance, attr) != value
+            ]
+            for attr in changed:
+                setattr(instance, attr, validated_data[attr])
 
-        instance.save()
+            instance.save(
+                update_fields=changed,
+                expected_version=expected_version,
+            )
         return instance
 
 
@@ -113,11 +173,166 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description']
 
 
+class RecipeDuplicateSerializer(serializers.Serializer):
+    """ Serializer for duplicating a recipe """
+    copies = serializers.IntegerField(min_value=1, max_value=50, default=1)
+    title = serializers.CharField(max_length=255, required=False)
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """ Serializer for deleting many recipes at once """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100000,
+    )
+
+
+class CookableRequestSerializer(serializers.Serializer):
+    """ Serializer for the ingredients a user has at hand """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=500,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    """ Serializer for a recipe ranked by ingredient coverage """
+    covered = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    missing = serializers.ListField(
+        child=serializers.IntegerField(),
+        read_only=True,
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + [
+            'covered',
+            'total',
+            'missing',
+        ]
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """ Serializer for a recipe ranked by similarity to another """
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['similarity']
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    """ Serializer for one price range, open ended ranges are null """
+    min = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        allow_null=True,
+    )
+    max = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        allow_null=True,
+    )
+    count = serializers.IntegerField()
+
+
+class TagCountSerializer(serializers.Serializer):
+    """ Serializer for a tag and how many recipes use it """
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """ Serializer for a user's recipe statistics """
+    recipe_count = serializers.IntegerField()
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    average_price = serializers.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        allow_null=True,
+    )
+    price_distribution = PriceBucketSerializer(many=True)
+    top_tags = TagCountSerializer(many=True)
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """ Serializer for one line of a shopping list """
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient__catalog__name')
+    quantity = serializers.DecimalField(
+        max_digits=16,
+        decimal_places=3,
+        allow_null=True,
+    )
+    unit = serializers.CharField(source='base_unit')
+
+
+class UploadedImageField(serializers.ImageField):
+    """ Image field that trusts files already checked while streaming """
+
+    def to_internal_value(self, data):
+        if getattr(data, 'image_size', None) is not None:
+            """ ImageUploadHandler read the header, skip opening it again """
+            return super(serializers.ImageField, self).to_internal_value(data)
+
+        return super().to_internal_value(data)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """ Serializer for uploading images to recipes """
+    image = UploadedImageField(required=True)
 
     class Meta:
         model = Recipe
         fields = ['id', 'image']
         read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+
+
+class CatalogNameSerializer(serializers.ModelSerializer):
+    """ Serializer for shared catalog names """
+
+    class Meta:
+        model = CatalogName
+        fields = ['id', 'name']
+        read_only_fields = fields
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    """ Serializer for deleted objects in the change feed """
+    type = serializers.CharField(source='kind')
+    id = serializers.IntegerField(source='object_id')
+
+    class Meta:
+        model = Tombstone
+        fields = ['type', 'id']
+
+
+class ChangesSerializer(serializers.Serializer):
+    """ Serializer for a page of the change feed """
+    recipes = RecipeDetailSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = TombstoneSerializer(many=True)
+    next = serializers.CharField()
+    has_more = serializers.BooleanField()
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """ Serializer for background job status """
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'result',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
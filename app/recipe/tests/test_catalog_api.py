@@ -0,0 +1,149 @@
+"""
+Tests for the shared name catalog API
+"""
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    CatalogName,
+    Tag,
+    Ingredient,
+)
+from core.tests.factories import create_user
+
+CATALOG_URL = reverse('recipe:catalog')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class PublicCatalogApiTests(TestCase):
+    """ Test unauthenticated API requests """
+
+    def test_auth_required(self):
+        """ Test auth is required for autocomplete """
+        res = APIClient().get(CATALOG_URL, {'q': 'sa'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCatalogApiTests(TestCase):
+    """ Test authenticated API requests """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_autocomplete_prefix(self):
+        """ Test names are matched by case-insensitive prefix """
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Tag.objects.create(user=self.user, name='Salad')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(CATALOG_URL, {'q': 'SA'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([n['name'] for n in res.data], ['Salad', 'Salt'])
+
+    def test_autocomplete_one_spelling_per_name(self):
+        """ Test spellings of the same name are suggested once """
+        Tag.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='salt')
+
+        res = self.client.get(CATALOG_URL, {'q': 'sa'})
+
+        self.assertEqual([n['name'] for n in res.data], ['Salt'])
+
+    def test_autocomplete_hides_other_users_names(self):
+        """ Test a name only another user has is not suggested """
+        other = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other, name='Saffron')
+
+        res = self.client.get(CATALOG_URL, {'q': 'sa'})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_suggests_common_names(self):
+        """ Test a name enough other users have is suggested """
+        for n, name in enumerate(['Sage', 'sage', 'SAGE']):
+            other = create_user(email=f'other{n}@example.com')
+            model = Tag if n else Ingredient
+            model.objects.create(user=other, name=name)
+
+        res = self.client.get(CATALOG_URL, {'q': 'sa'})
+
+        self.assertEqual([n['name'] for n in res.data], ['Sage'])
+
+    def test_autocomplete_escapes_wildcards(self):
+        """ Test % and _ in the query match literally """
+        Tag.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(CATALOG_URL, {'q': '_a%'})
+
+        self.assertEqual(res.data, [])
+
+    def test_deleting_last_tag_prunes_name(self):
+        """ Test a name nobody uses any more leaves the catalog """
+        tag = Tag.objects.create(user=self.user, name='Brunch')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(CatalogName.objects.values_list('name', flat=True)),
+            ['Salt'],
+        )
+
+    def test_renaming_tag_prunes_old_name(self):
+        """ Test a rename drops the old name when nobody else has it """
+        tag = Tag.objects.create(user=self.user, name='Brunch')
+        Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name='Supper',
+        )
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]),
+            {'name': 'Supper'},
+        )
+
+        self.assertFalse(CatalogName.objects.filter(name='Brunch').exists())
+        self.assertTrue(CatalogName.objects.filter(name='Supper').exists())
+
+    def test_save_recreates_pruned_name(self):
+        """ Test a row whose name was pruned since it was set re-creates it """
+        tag = Tag(user=self.user, name='Brunch')
+        CatalogName.objects.prune()
+
+        tag.save()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Brunch')
+
+    def test_autocomplete_requires_query(self):
+        """ Test an empty query is rejected """
+        res = self.client.get(CATALOG_URL, {'q': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_reuses_tag_by_normalized_name(self):
+        """ Test a differently cased name reuses the existing tag """
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '4.00',
+            'tags': [{'name': 'dinner '}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(res.data['tags'][0]['id'], tag.id)
@@ -0,0 +1,188 @@
+"""
+Tests for the change feed API
+"""
+import threading
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    CHANGE_LOCK_NAMESPACE,
+    Tag,
+    Ingredient,
+)
+from core.tests.factories import create_recipe, create_user
+
+CHANGES_URL = reverse('recipe:changes')
+
+
+class PublicChangesApiTests(TestCase):
+    """ Test unauthenticated API requests """
+
+    def test_auth_required(self):
+        """ Test auth is required for the change feed """
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateChangesApiTests(TestCase):
+    """ Test authenticated API requests """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_initial_sync_returns_everything(self):
+        """ Test without a token all of the user's objects are returned """
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        other = create_user(email='other@example.com')
+        create_recipe(other)
+
+        res = self.client.get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual([t['id'] for t in res.data['tags']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in res.data['ingredients']],
+            [ingredient.id],
+        )
+        self.assertFalse(res.data['has_more'])
+
+    def test_only_changes_after_token(self):
+        """ Test the token limits results to later changes """
+        create_recipe(self.user, title='Old')
+        token = self.client.get(CHANGES_URL).data['next']
+        updated = create_recipe(self.user, title='New')
+
+        res = self.client.get(CHANGES_URL, {'since': token})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [updated.id])
+
+    def test_update_and_tag_change_reported(self):
+        """ Test edits and tag assignment bump the recipe """
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        token = self.client.get(CHANGES_URL).data['next']
+
+        recipe.tags.add(tag)
+        res = self.client.get(CHANGES_URL, {'since': token})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_reverse_clear_reported(self):
+        """ Test clearing a tag from all recipes bumps those recipes """
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+        token = self.client.get(CHANGES_URL).data['next']
+
+        tag.recipe_set.clear()
+        res = self.client.get(CHANGES_URL, {'since': token})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+
+    def test_deletion_returns_tombstone(self):
+        """ Test deleting through the API leaves a tombstone """
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        token = self.client.get(CHANGES_URL).data['next']
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+        self.client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+        res = self.client.get(CHANGES_URL, {'since': token})
+
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['deleted'], [
+            {'type': 'recipe', 'id': recipe.id},
+            {'type': 'tag', 'id': tag.id},
+        ])
+
+    def test_bounded_pages(self):
+        """ Test changes are paged in sequence order """
+        recipes = [create_recipe(self.user, title=f'R{i}') for i in range(3)]
+        tag = Tag.objects.create(user=self.user, name='Quick')
+
+        first = self.client.get(CHANGES_URL, {'limit': 2}).data
+        second = self.client.get(
+            CHANGES_URL, {'limit': 2, 'since': first['next']}
+        ).data
+
+        self.assertTrue(first['has_more'])
+        self.assertEqual(
+            [r['id'] for r in first['recipes']],
+            [recipes[0].id, recipes[1].id],
+        )
+        self.assertFalse(second['has_more'])
+        self.assertEqual([r['id'] for r in second['recipes']],
+                         [recipes[2].id])
+        self.assertEqual([t['id'] for t in second['tags']], [tag.id])
+
+    def test_invalid_token_rejected(self):
+        """ Test a malformed token returns 400 """
+        res = self.client.get(CHANGES_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sequence_taken_in_the_write(self):
+        """ Test saving takes its sequence value without a round trip """
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        before = tag.change_seq
+
+        with CaptureQueriesContext(connection) as ctx:
+            tag.name = 'Dinner'
+            tag.save(update_fields=['name'])
+
+        self.assertFalse(any(
+            q['sql'].startswith('SELECT nextval') for q in ctx.captured_queries
+        ))
+        self.assertGreater(tag.change_seq, before)
+
+
+class ChangeOrderTests(TransactionTestCase):
+    """ Test a user's changes commit in sequence order """
+
+    def _lock_free(self, user_id):
+        """ Try the user's change lock from another connection """
+        result = []
+
+        def probe():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT pg_try_advisory_xact_lock(%s, %s)',
+                        [CHANGE_LOCK_NAMESPACE, user_id],
+                    )
+                    result.append(cursor.fetchone()[0])
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_write_holds_user_lock_until_commit(self):
+        """ Test another writer for the user waits for the commit """
+        user = create_user()
+        other = create_user(email='other@example.com')
+
+        with transaction.atomic():
+            create_recipe(user)
+            self.assertFalse(self._lock_free(user.id))
+            self.assertTrue(self._lock_free(other.id))
+
+        self.assertTrue(self._lock_free(user.id))
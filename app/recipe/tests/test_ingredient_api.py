@@ -4,7 +4,6 @@ Tests for Ingredients API
 
 from decimal import Decimal
 
-from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
 
@@ -15,6 +14,7 @@ from core.models import (
     Ingredient,
     Recipe
 )
+from core.tests.factories import create_user
 
 from recipe.serializers import IngredientSerializer
 
@@ -27,11 +27,6 @@ def detail_url(ingredient_id):
     return reverse('recipe:ingredient-detail', args=[ingredient_id])
 
 
-def create_user(email='user@example.com', password='Password123'):
-    """ Create and return user """
-    return get_user_model().objects.create(email=email, password=password)
-
-
 class PublicIngredientsApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -46,8 +41,11 @@ class PublicIngredientsApiTests(TestCase):
 class PrivateIngredientsApiTests(TestCase):
     """ Test authenticated API Requests """
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
     def setUp(self):
-        self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
@@ -58,7 +56,7 @@ class PrivateIngredientsApiTests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL)
 
-        ingredients = Ingredient.objects.all().order_by('-name')
+        ingredients = Ingredient.objects.all().order_by('-catalog__name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
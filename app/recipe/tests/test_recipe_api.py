@@ -3,22 +3,34 @@ Tests for Recipe API
 """
 
 from decimal import Decimal
+from io import BytesIO
+import json
+import shutil
 import tempfile
 import os
 
 from PIL import Image
 
-from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import jobs
+from core.tests.factories import create_recipe, create_user
 from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    RecipeIngredient,
+    Job,
 )
 
 from recipe.serializers import (
@@ -27,6 +39,11 @@ from recipe.serializers import (
 )
 
 RECIPES_URL = reverse('recipe:recipe-list')
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+EXPORT_URL = reverse('recipe:recipe-export-recipes')
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
 
 
 def detail_url(recipe_id):
@@ -34,32 +51,16 @@ def detail_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
 
 
+def duplicate_url(recipe_id):
+    """ Create and return a recipe duplicate URL """
+    return reverse('recipe:recipe-duplicate', args=[recipe_id])
+
+
 def image_upload_url(recipe_id):
     """ Create and Return an Image upload URL """
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
-def create_recipe(user, **params):
-    """ Helper Function - Create and return sample recipe """
-    defaults = {
-        'title': 'Sample Recipe Title',
-        'time_minutes': 22,
-        'price': Decimal('1.00'),
-        'description': 'Sample Description',
-        'link': 'http://example.com/recipe.pdf',
-    }
-    """ Overwrite dictionary with provided params """
-    defaults.update(params)
-
-    recipe = Recipe.objects.create(user=user, **defaults)
-    return recipe
-
-
-def create_user(**params):
-    """ Helper - Create and return a new user """
-    return get_user_model().objects.create_user(**params)
-
-
 class PublicRecipeAPITests(TestCase):
     """ Test unauthenticated API Requests """
 
@@ -75,12 +76,15 @@ class PublicRecipeAPITests(TestCase):
 class PrivateRecipeAPITests(TestCase):
     """ Test authenticated API Requests """
 
-    """ setup creates user """
+    """ user is created once per class, each test gets a copy """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
+            email='user@example.com', password='Password123')
 
     def setUp(self):
         self.client = APIClient()
-        self.user = create_user(
-            email='user@example.com', password='Password123')
         self.client.force_authenticate(self.user)
 
     def test_retrieve_recipes(self):
@@ -109,6 +113,22 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_recipe_list_names_prefetched(self):
+        """ Test tag and ingredient names are read with the links """
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        for _ in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Dinner')
+        self.assertEqual(res.data[0]['ingredients'][0]['name'], 'Rice')
+
     def test_get_recipe_detail(self):
         """ Test get recipe detail """
         recipe = create_recipe(user=self.user)
@@ -184,6 +204,61 @@ class PrivateRecipeAPITests(TestCase):
 
         self.assertEqual(recipe.user, self.user)
 
+    def test_update_increments_version(self):
+        """ Test each update moves the recipe to the next version """
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)
+
+        res = self.client.patch(url, {'title': 'First', 'version': 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['version'], 2)
+        res = self.client.patch(url, {'title': 'Second'})
+        self.assertEqual(res.data['version'], 3)
+
+    def test_update_stale_version_conflict(self):
+        """ Test an update based on an old version returns 409 """
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = create_recipe(user=self.user, title='Original')
+        recipe.tags.add(tag)
+        url = detail_url(recipe.id)
+        self.client.patch(url, {'title': 'Edited elsewhere'})
+
+        payload = {
+            'title': 'Stale edit',
+            'version': 1,
+            'tags': [{'name': 'Dinner'}],
+        }
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Edited elsewhere')
+        self.assertEqual(recipe.version, 2)
+        """ the link changes rolled back with the save """
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_update_writes_changed_columns(self):
+        """ Test an update only writes the fields that changed """
+        recipe = create_recipe(user=self.user, title='Original')
+        url = detail_url(recipe.id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(url, {
+                'title': 'New title',
+                'link': recipe.link,
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "core_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertIn('"core_recipe"."version" = 1', updates[0])
+        for column in ['"link"', '"description"', '"price"', '"image"']:
+            self.assertNotIn(column, updates[0])
+
     def test_user_unable_to_reassign_user(self):
         """ Test user is unable to change owner of recipe """
         new_user = create_user(
@@ -244,7 +319,7 @@ class PrivateRecipeAPITests(TestCase):
         for tag in payload['tags']:
             """ loop each tag ensure name is correct and exist """
             exists = recipe.tags.filter(
-                name=tag['name'],
+                catalog__name=tag['name'],
                 user=self.user,
             ).exists()
             self.assertTrue(exists)
@@ -268,7 +343,7 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(tag_indian, recipe.tags.all())
         for tag in payload['tags']:
             exists = recipe.tags.filter(
-                name=tag['name'],
+                catalog__name=tag['name'],
                 user=self.user,
             ).exists()
             self.assertTrue(exists)
@@ -282,7 +357,7 @@ class PrivateRecipeAPITests(TestCase):
         res = self.client.patch(url, payload, format='json')
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        new_tag = Tag.objects.get(user=self.user, name='lunch')
+        new_tag = Tag.objects.get(user=self.user, catalog__name='lunch')
         self.assertIn(new_tag, recipe.tags.all())
 
     def test_update_recipe_assign_tag(self):
@@ -334,7 +409,7 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(recipe.ingredients.count(), 2)
         for ingredient in payload['ingredients']:
             exists = recipe.ingredients.filter(
-                name=ingredient['name'],
+                catalog__name=ingredient['name'],
                 user=self.user,
             ).exists()
             self.assertTrue(exists)
@@ -361,11 +436,257 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(ingredient, recipe.ingredients.all())
         for ingredient in payload['ingredients']:
             exists = recipe.ingredients.filter(
-                name=ingredient['name'],
+                catalog__name=ingredient['name'],
                 user=self.user,
             ).exists()
             self.assertTrue(exists)
 
+    def test_duplicate_recipe(self):
+        """ Test duplicating copies fields, tags and ingredient amounts """
+        recipe = create_recipe(user=self.user, title='Base')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient, through_defaults={
+            'quantity': Decimal('200'), 'unit': 'g'})
+        recipe.refresh_from_db()
+
+        res = self.client.post(duplicate_url(recipe.id), {'copies': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        copies = Recipe.objects.filter(user=self.user).exclude(id=recipe.id)
+        self.assertEqual(copies.count(), 3)
+        for copy in copies:
+            self.assertEqual(copy.title, 'Base')
+            self.assertEqual(copy.price, recipe.price)
+            self.assertEqual(list(copy.tags.all()), [tag])
+            amount = copy.ingredient_amounts.get()
+            self.assertEqual(amount.ingredient, ingredient)
+            self.assertEqual(amount.quantity, Decimal('200'))
+            self.assertGreater(copy.change_seq, recipe.change_seq)
+        self.assertEqual(res.data[0]['ingredients'][0]['unit'], 'g')
+
+    def test_duplicate_recipe_with_title(self):
+        """ Test a copy can be given a new title """
+        recipe = create_recipe(user=self.user, title='Base')
+
+        res = self.client.post(duplicate_url(recipe.id), {'title': 'Copy'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['title'], 'Copy')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Base')
+
+    def test_duplicate_other_users_recipe_not_found(self):
+        """ Test users cannot copy recipes they do not own """
+        other = create_user(email='other@example.com', password='test123')
+        recipe = create_recipe(user=other)
+
+        res = self.client.post(duplicate_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_duplicate_too_many_copies_rejected(self):
+        """ Test the number of copies is bounded """
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.post(duplicate_url(recipe.id), {'copies': 51})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_recipe_with_ingredient_amounts(self):
+        """ Test quantities and units are stored and returned """
+        payload = {
+            'title': 'Bread',
+            'time_minutes': 90,
+            'price': Decimal('1.00'),
+            'ingredients': [
+                {'name': 'Flour', 'quantity': '500', 'unit': 'g'},
+                {'name': 'Salt'},
+            ],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        amount = RecipeIngredient.objects.get(
+            ingredient__catalog__name='Flour',
+        )
+        self.assertEqual(amount.quantity, Decimal('500'))
+        self.assertEqual(amount.unit, 'g')
+        flour = next(
+            i for i in res.data['ingredients'] if i['name'] == 'Flour'
+        )
+        self.assertEqual(flour['id'], amount.ingredient_id)
+        self.assertEqual(flour['quantity'], '500.000')
+
+    def test_create_recipe_invalid_unit(self):
+        """ Test unknown units are rejected """
+        payload = {
+            'title': 'Bread',
+            'time_minutes': 90,
+            'price': Decimal('1.00'),
+            'ingredients': [{'name': 'Flour', 'quantity': 1, 'unit': 'lb'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list_sums_normalized_units(self):
+        """ Test amounts across recipes are summed in base units """
+        flour = Ingredient.objects.create(user=self.user, name='Flour')
+        milk = Ingredient.objects.create(user=self.user, name='Milk')
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        r3 = create_recipe(user=self.user)
+        r1.ingredients.add(flour, through_defaults={
+            'quantity': Decimal('500'), 'unit': 'g'})
+        r2.ingredients.add(flour, through_defaults={
+            'quantity': Decimal('1.5'), 'unit': 'kg'})
+        r1.ingredients.add(milk, through_defaults={
+            'quantity': Decimal('1'), 'unit': 'cup'})
+        r2.ingredients.add(milk, through_defaults={
+            'quantity': Decimal('0.5'), 'unit': 'l'})
+        r3.ingredients.add(milk, through_defaults={
+            'quantity': Decimal('1'), 'unit': 'l'})
+
+        res = self.client.get(
+            SHOPPING_LIST_URL,
+            {'recipes': f'{r1.id},{r2.id}'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': flour.id, 'name': 'Flour',
+             'quantity': '2000.000', 'unit': 'g'},
+            {'id': milk.id, 'name': 'Milk',
+             'quantity': '736.588', 'unit': 'ml'},
+        ])
+
+    def test_shopping_list_limited_to_user(self):
+        """ Test other users' recipes are ignored """
+        other = create_user(email='other@example.com', password='test123')
+        recipe = create_recipe(user=other)
+        ingredient = Ingredient.objects.create(user=other, name='Salt')
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(SHOPPING_LIST_URL, {'recipes': recipe.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_shopping_list_requires_recipes(self):
+        """ Test malformed recipe ids are rejected """
+        res = self.client.get(SHOPPING_LIST_URL, {'recipes': 'a,b'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_in_background(self):
+        """ Test bulk deletion runs as a job limited to the user """
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        other = create_recipe(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+
+        res = self.client.post(BULK_DELETE_URL, {
+            'ids': [recipes[0].id, recipes[1].id, other.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        jobs.run_pending()
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'deleted': 2})
+        self.assertEqual(
+            set(Recipe.objects.values_list('id', flat=True)),
+            {recipes[2].id, other.id},
+        )
+        gc = Job.objects.get(name='media.gc')
+        self.assertEqual(gc.status, Job.QUEUED)
+        self.assertGreater(gc.run_after, timezone.now())
+
+    def test_cookable_ranked_by_coverage(self):
+        """ Test recipes rank by covered ingredients, missing are listed """
+        eggs, milk, flour, salt = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Eggs', 'Milk', 'Flour', 'Salt']
+        ]
+        pancakes = create_recipe(user=self.user, title='Pancakes')
+        pancakes.ingredients.add(eggs, milk, flour)
+        omelette = create_recipe(user=self.user, title='Omelette')
+        omelette.ingredients.add(eggs, salt)
+        custard = create_recipe(user=self.user, title='Custard')
+        custard.ingredients.add(eggs, milk)
+        bread = create_recipe(user=self.user, title='Bread')
+        bread.ingredients.add(flour, salt)
+
+        """ one aggregate, then prefetches for the nested fields """
+        with self.assertNumQueries(3):
+            res = self.client.post(
+                COOKABLE_URL,
+                {'ingredients': [eggs.id, milk.id]},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r['title'], r['covered'], r['total'], r['missing'])
+             for r in res.data],
+            [
+                ('Custard', 2, 2, []),
+                ('Pancakes', 2, 3, [flour.id]),
+                ('Omelette', 1, 2, [salt.id]),
+            ],
+        )
+
+    def test_cookable_max_missing(self):
+        """ Test max_missing drops recipes needing more ingredients """
+        eggs, milk = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Eggs', 'Milk']
+        ]
+        omelette = create_recipe(user=self.user, title='Omelette')
+        omelette.ingredients.add(eggs)
+        custard = create_recipe(user=self.user, title='Custard')
+        custard.ingredients.add(eggs, milk)
+
+        res = self.client.post(
+            COOKABLE_URL,
+            {'ingredients': [eggs.id], 'max_missing': 0},
+            format='json',
+        )
+
+        self.assertEqual([r['id'] for r in res.data], [omelette.id])
+
+    def test_cookable_limited_to_user(self):
+        """ Test other users' recipes are ignored """
+        other = create_user(email='other@example.com', password='test123')
+        recipe = create_recipe(user=other)
+        ingredient = Ingredient.objects.create(user=other, name='Salt')
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.post(
+            COOKABLE_URL,
+            {'ingredients': [ingredient.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_cookable_requires_ingredients(self):
+        """ Test an empty ingredient list is rejected """
+        res = self.client.post(
+            COOKABLE_URL,
+            {'ingredients': []},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_ingredient_on_update(self):
         """ Test creating an ingredient when updating a recipe """
         recipe = create_recipe(user=self.user)
@@ -380,7 +701,10 @@ class PrivateRecipeAPITests(TestCase):
         res = self.client.patch(url, payload, format='json')
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        new_ingredient = Ingredient.objects.get(user=self.user, name='Limes')
+        new_ingredient = Ingredient.objects.get(
+            user=self.user,
+            catalog__name='Limes',
+        )
         self.assertIn(new_ingredient, recipe.ingredients.all())
 
     def test_update_recipe_assign_ingredient(self):
@@ -455,18 +779,77 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_order_by_price(self):
+        """ Test ordering recipes by price, ties broken by id """
+        r1 = create_recipe(user=self.user, price=Decimal('9.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('2.00'))
+        r3 = create_recipe(user=self.user, price=Decimal('9.00'))
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r1.id, r3.id])
+
+    def test_order_by_time_descending(self):
+        """ Test ordering recipes by time taken, longest first """
+        r1 = create_recipe(user=self.user, time_minutes=10)
+        r2 = create_recipe(user=self.user, time_minutes=45)
+
+        res = self.client.get(RECIPES_URL, {'ordering': '-time_minutes'})
+
+        self.assertEqual([r['id'] for r in res.data], [r2.id, r1.id])
+
+    def test_invalid_ordering_rejected(self):
+        """ Test ordering by a field that is not whitelisted """
+        res = self.client.get(RECIPES_URL, {'ordering': 'description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_max_time(self):
+        """ Test filtering recipes taking at most max_time minutes """
+        r1 = create_recipe(user=self.user, time_minutes=15)
+        r2 = create_recipe(user=self.user, time_minutes=30)
+        create_recipe(user=self.user, time_minutes=60)
+
+        res = self.client.get(RECIPES_URL, {'max_time': 30})
+
+        self.assertEqual(
+            sorted(r['id'] for r in res.data),
+            sorted([r1.id, r2.id]),
+        )
+
+    def test_filter_by_price_range(self):
+        """ Test filtering recipes by min and max price """
+        create_recipe(user=self.user, price=Decimal('2.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('5.00'))
+        create_recipe(user=self.user, price=Decimal('12.00'))
+
+        params = {'min_price': '3', 'max_price': '9.99'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual([r['id'] for r in res.data], [r2.id])
+
+    def test_invalid_range_rejected(self):
+        """ Test malformed range values return 400 """
+        res = self.client.get(RECIPES_URL, {'max_price': 'cheap'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
     """ Tests for the image upload API """
 
-    def setUp(self):
-        self.client = APIClient()
-        self.user = create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
             email='user@example.com',
             password='Password123'
         )
+        cls.recipe = create_recipe(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
         self.client.force_authenticate(self.user)
-        self.recipe = create_recipe(user=self.user)
 
     """ Destroy image at end of testing """
 
@@ -488,6 +871,43 @@ class ImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_queues_processing(self):
+        """ Test uploading an image queues a processing job """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        job = Job.objects.get(name='recipe.process_image')
+        self.assertEqual(job.payload, {
+            'recipe_id': self.recipe.id,
+            'image': self.recipe.image.name,
+        })
+
+    @override_settings(RECIPE_IMAGE_MAX_DIMENSION=20)
+    def test_process_image_shrinks_large_image(self):
+        """ Test the processing job resizes oversized images """
+        output = BytesIO()
+        Image.new('RGB', (80, 40)).save(output, format='PNG')
+        self.recipe.image.save('big.png', ContentFile(output.getvalue()))
+        original = self.recipe.image.name
+        jobs.enqueue(
+            'recipe.process_image',
+            recipe_id=self.recipe.id,
+            image=original,
+        )
+
+        jobs.run_pending()
+
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, original)
+        """ left for gc_media, another upload may share the file """
+        self.assertTrue(default_storage.exists(original))
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (20, 10))
+
     def test_upload_image_bad_request(self):
         """ Test uploading invalid image """
         url = image_upload_url(self.recipe.id)
@@ -495,3 +915,162 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _post_image(self, content, name='upload.png'):
+        """ Upload raw bytes as the recipe image """
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': upload},
+            format='multipart',
+        )
+
+    def _png(self, size):
+        output = BytesIO()
+        Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(
+            output,
+            format='PNG',
+        )
+        return output.getvalue()
+
+    def test_upload_image_wrong_type_rejected(self):
+        """ Test files without an image signature are rejected """
+        res = self._post_image(b'<html>not an image</html>', 'fake.jpg')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], ['Unsupported image type.'])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_image_too_large_rejected(self):
+        """ Test uploads over the size limit are rejected while streaming """
+        res = self._post_image(self._png((64, 64)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], ['Image file too large.'])
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_upload_image_dimensions_rejected(self):
+        """ Test images with too many pixels are rejected from the header """
+        res = self._post_image(self._png((10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], ['Image dimensions too large.'])
+
+    def test_upload_image_truncated_rejected(self):
+        """ Test a valid signature with a broken header is rejected """
+        res = self._post_image(self._png((10, 10))[:20])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['image'], ['Upload a valid image.'])
+
+
+class ImportExportTests(TestCase):
+    """ Tests for background recipe import and export """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
+            email='user@example.com',
+            password='Password123'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.media_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_import_recipes(self):
+        """ Test importing recipes in a background job """
+        payload = [
+            {'title': 'Pancakes', 'time_minutes': 15, 'price': '1.50',
+             'tags': [{'name': 'Breakfast'}]},
+            {'title': 'Omelette', 'time_minutes': 5, 'price': '2.00',
+             'tags': [{'name': 'Breakfast'}]},
+        ]
+
+        res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+        jobs.run_pending()
+
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.status, Job.DONE)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_import_invalid_recipes_rejected(self):
+        """ Test invalid imports are rejected before queueing """
+        payload = [{'title': 'No time or price'}]
+
+        res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_export_recipes(self):
+        """ Test exporting recipes writes a private JSON file """
+        create_recipe(user=self.user, title='Soup')
+
+        res = self.client.post(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        with self.settings(EXPORT_ROOT=self.media_root):
+            jobs.run_pending()
+
+            job_url = reverse('recipe:job-detail', args=[res.data['id']])
+            job = self.client.get(job_url).data
+            self.assertEqual(job['status'], Job.DONE)
+            download = self.client.get(job['result']['url'])
+
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        exported = json.loads(b''.join(download.streaming_content))
+        self.assertEqual([r['title'] for r in exported], ['Soup'])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.media_root, job['result']['file'])
+        ))
+
+    def test_export_download_limited_to_owner(self):
+        """ Test other users cannot download an export """
+        other = create_user(email='other@example.com', password='Pass12345')
+        res = self.client.post(EXPORT_URL)
+        with self.settings(EXPORT_ROOT=self.media_root):
+            jobs.run_pending()
+
+            self.client.force_authenticate(other)
+            download = self.client.get(
+                reverse('recipe:job-download', args=[res.data['id']])
+            )
+
+        self.assertEqual(download.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_expires(self):
+        """ Test an export is deleted and unavailable after its TTL """
+        res = self.client.post(EXPORT_URL)
+        with self.settings(EXPORT_ROOT=self.media_root, EXPORT_TTL=0):
+            """ the expiry job is due at once and runs in the same pass """
+            jobs.run_pending()
+
+            job = Job.objects.get(id=res.data['id'])
+            download = self.client.get(job.result['url'])
+
+        self.assertEqual(download.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.media_root, job.result['file'])
+        ))
+
+    def test_jobs_limited_to_user(self):
+        """ Test users only see their own jobs """
+        other = create_user(email='other@example.com', password='Pass12345')
+        jobs.enqueue('recipe.export', user=other)
+        mine = jobs.enqueue('recipe.export', user=self.user)
+
+        res = self.client.get(reverse('recipe:job-list'))
+
+        self.assertEqual([j['id'] for j in res.data], [mine.id])
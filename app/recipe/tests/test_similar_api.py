@@ -0,0 +1,168 @@
+"""
+Tests for the similar recipes API
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.models import Recipe
+from core.tests.factories import (
+    create_user,
+    create_recipe,
+    create_tag,
+    create_ingredient,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def similar_url(recipe_id):
+    """ Create and return a similar recipes URL """
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+class SignatureTests(TestCase):
+    """ Test MinHash signatures """
+
+    def test_estimate_close_to_jaccard(self):
+        """ Test equal positions estimate the Jaccard similarity """
+        first = similarity.signature(set(range(0, 100)))
+        second = similarity.signature(set(range(50, 150)))
+
+        equal = sum(a == b for a, b in zip(first, second))
+        self.assertAlmostEqual(equal / len(first), 1 / 3, delta=0.15)
+
+    def test_empty_set_unsigned(self):
+        """ Test a recipe without tags or ingredients has no signature """
+        self.assertIsNone(similarity.signature(set()))
+        self.assertEqual(similarity.bands(None), [])
+
+
+class PrivateSimilarApiTests(TestCase):
+    """ Test authenticated API requests """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.tags = [create_tag(cls.user, name=f'Tag {i}') for i in range(3)]
+        cls.ingredients = [
+            create_ingredient(cls.user, name=f'Ingredient {i}')
+            for i in range(3)
+        ]
+        cls.recipe = cls.recipe_with([0, 1], [0, 1])
+
+    @classmethod
+    def recipe_with(cls, tags, ingredients, user=None):
+        recipe = create_recipe(user or cls.user)
+        recipe.tags.add(*[cls.tags[i] for i in tags])
+        recipe.ingredients.add(*[cls.ingredients[i] for i in ingredients])
+        recipe.refresh_from_db()
+        return recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ranked_by_similarity(self):
+        """ Test recipes sharing more tags and ingredients rank first """
+        twin = self.recipe_with([0, 1], [0, 1])
+        close = self.recipe_with([0, 1], [0])
+        unrelated = self.recipe_with([2], [2])
+        other_user = create_user(email='other@example.com')
+        self.recipe_with([0, 1], [0, 1], user=other_user)
+
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data],
+            [twin.id, close.id],
+        )
+        self.assertEqual(res.data[0]['similarity'], 1.0)
+        self.assertLess(res.data[1]['similarity'], 1.0)
+        self.assertNotIn(unrelated.id, [r['id'] for r in res.data])
+
+    def test_signature_follows_link_changes(self):
+        """ Test removing and deleting links updates the signature """
+        twin = self.recipe_with([0, 1], [0, 1])
+        twin.tags.remove(self.tags[1])
+        twin.refresh_from_db()
+        self.assertNotEqual(twin.minhash, self.recipe.minhash)
+
+        self.ingredients[1].delete()
+        self.tags[1].delete()
+        twin.refresh_from_db()
+        self.recipe.refresh_from_db()
+        self.assertEqual(twin.minhash, self.recipe.minhash)
+
+    def test_signed_once_per_save(self):
+        """ Test the API signs a recipe once after adding all links """
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.00',
+            'tags': [{'name': 'Tag 0'}, {'name': 'Tag 1'}],
+            'ingredients': [
+                {'name': 'Ingredient 0'},
+                {'name': 'Ingredient 1'},
+            ],
+        }
+
+        with patch.object(
+            similarity,
+            'compute',
+            wraps=similarity.compute,
+        ) as compute:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        compute.assert_called_once()
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.minhash, self.recipe.minhash)
+        self.assertEqual(recipe.minhash_bands, self.recipe.minhash_bands)
+
+    def test_duplicate_keeps_signature(self):
+        """ Test server side copies are found as identical """
+        new_ids = Recipe.objects.duplicate(self.recipe, copies=2)
+
+        res = self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual([r['id'] for r in res.data], new_ids[::-1])
+
+    def test_recipe_without_links(self):
+        """ Test a recipe without tags or ingredients has no neighbours """
+        recipe = create_recipe(self.user)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_limit(self):
+        """ Test limit caps the result and is validated """
+        for _ in range(3):
+            self.recipe_with([0, 1], [0, 1])
+
+        res = self.client.get(similar_url(self.recipe.id), {'limit': 2})
+        self.assertEqual(len(res.data), 2)
+
+        for limit in [0, 51]:
+            res = self.client.get(
+                similar_url(self.recipe.id),
+                {'limit': limit},
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_recipe_not_found(self):
+        """ Test asking for another user's recipe returns 404 """
+        other_user = create_user(email='other@example.com')
+        recipe = create_recipe(other_user)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,166 @@
+"""
+Tests for the recipe statistics API
+"""
+from decimal import Decimal
+
+from django.db.models import Avg, Count, Sum
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeStats
+from core.tests.factories import create_recipe, create_tag, create_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+STATS_URL = reverse('recipe:recipe-stats')
+
+
+def detail_url(recipe_id):
+    """ Create and return recipe detail URL """
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class PublicStatsApiTests(TestCase):
+    """ Test unauthenticated API requests """
+
+    def test_auth_required(self):
+        """ Test auth is required for statistics """
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """ Test authenticated API requests """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_matches_recipes(self):
+        """ Running totals equal a full recount """
+        stats = RecipeStats.objects.get(user=self.user)
+        recipes = Recipe.objects.filter(user=self.user)
+        totals = recipes.aggregate(
+            count=Count('id'),
+            time=Sum('time_minutes'),
+            price=Sum('price'),
+        )
+        self.assertEqual(stats.recipe_count, totals['count'])
+        self.assertEqual(stats.time_minutes_total, totals['time'] or 0)
+        self.assertEqual(stats.price_total, totals['price'] or 0)
+        self.assertEqual(
+            sum(stats.price_histogram),
+            totals['count'],
+        )
+        tag_counts = recipes.values('tags').exclude(tags=None).annotate(
+            n=Count('id'),
+        ).order_by()
+        self.assertEqual(
+            stats.tag_counts,
+            {str(row['tags']): row['n'] for row in tag_counts},
+        )
+
+    def test_no_recipes(self):
+        """ Test a user without recipes gets empty statistics """
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_time_minutes'])
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['top_tags'], [])
+        self.assertEqual(
+            [b['count'] for b in res.data['price_distribution']],
+            [0, 0, 0, 0, 0],
+        )
+
+    def test_stats_from_api_changes(self):
+        """ Test creating, editing and deleting recipes updates the stats """
+        for title, minutes, price, tags in [
+            ('Soup', 10, '4.00', ['Dinner', 'Quick']),
+            ('Stew', 90, '12.50', ['Dinner']),
+            ('Cake', 60, '30.00', ['Dessert']),
+        ]:
+            res = self.client.post(RECIPES_URL, {
+                'title': title,
+                'time_minutes': minutes,
+                'price': price,
+                'tags': [{'name': name} for name in tags],
+            }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        stew = Recipe.objects.get(title='Stew')
+        cake = Recipe.objects.get(title='Cake')
+
+        self.client.patch(detail_url(stew.id), {
+            'price': '60.00',
+            'tags': [{'name': 'Quick'}],
+        }, format='json')
+        self.client.delete(detail_url(cake.id))
+
+        """ the stats row and the top tag names, whatever the recipe count """
+        with self.assertNumQueries(2):
+            res = self.client.get(STATS_URL)
+
+        self.assert_matches_recipes()
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_time_minutes'], 50)
+        self.assertEqual(res.data['average_price'], '32.00')
+        self.assertEqual(res.data['price_distribution'], [
+            {'min': None, 'max': '5.00', 'count': 1},
+            {'min': '5.00', 'max': '10.00', 'count': 0},
+            {'min': '10.00', 'max': '20.00', 'count': 0},
+            {'min': '20.00', 'max': '50.00', 'count': 0},
+            {'min': '50.00', 'max': None, 'count': 1},
+        ])
+        self.assertEqual(
+            [(t['name'], t['recipes']) for t in res.data['top_tags']],
+            [('Quick', 2), ('Dinner', 1)],
+        )
+
+    def test_stats_follow_direct_changes(self):
+        """ Test model, link and raw SQL changes keep totals exact """
+        dinner = create_tag(self.user, name='Dinner')
+        quick = create_tag(self.user, name='Quick')
+        soup = create_recipe(self.user, price=Decimal('3.00'))
+        stew = create_recipe(self.user, price=Decimal('15.00'))
+        soup.tags.add(dinner, quick)
+        dinner.recipe_set.add(stew)
+        self.assert_matches_recipes()
+
+        Recipe.objects.duplicate(soup, copies=3)
+        self.assert_matches_recipes()
+
+        soup.tags.remove(quick, dinner)
+        quick.recipe_set.clear()
+        self.assert_matches_recipes()
+
+        reloaded = Recipe.objects.only('id', 'user').get(id=stew.id)
+        reloaded.time_minutes = 5
+        reloaded.save()
+        self.assert_matches_recipes()
+
+        dinner.delete()
+        soup.delete()
+        self.assert_matches_recipes()
+        self.assertEqual(
+            Recipe.objects.filter(user=self.user).aggregate(
+                avg=Avg('time_minutes'),
+            )['avg'],
+            self.client.get(STATS_URL).data['average_time_minutes'],
+        )
+
+    def test_stats_limited_to_user(self):
+        """ Test other users' recipes are not counted """
+        other = create_user(email='other@example.com')
+        create_recipe(other)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
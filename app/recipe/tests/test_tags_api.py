@@ -3,7 +3,6 @@ Tests for recipe API
 """
 from decimal import Decimal
 
-from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
 
@@ -14,6 +13,7 @@ from core.models import (
     Tag,
     Recipe,
 )
+from core.tests.factories import create_user
 
 from recipe.serializers import TagSerializer
 
@@ -25,11 +25,6 @@ def detail_url(tag_id):
     return reverse('recipe:tag-detail', args=[tag_id])
 
 
-def create_user(email='user1@example.com', password='Password123'):
-    """ Create and return a User """
-    return get_user_model().objects.create_user(email=email, password=password)
-
-
 class PublicTagsApiTests(TestCase):
     """ Test unauthenticated API requests """
 
@@ -46,8 +41,11 @@ class PublicTagsApiTests(TestCase):
 class PrivateTagsApiTests(TestCase):
     """ Test authenticated API Requests """
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user1@example.com')
+
     def setUp(self):
-        self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
@@ -58,7 +56,7 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.all().order_by('-name')
+        tags = Tag.objects.all().order_by('-catalog__name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
@@ -15,9 +15,12 @@ router = DefaultRouter()
 router.register('recipes', views.RecipeViewSet)
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
+router.register('jobs', views.JobViewSet)
 
 app_name = 'recipe'
 
 urlpatterns = [
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('catalog/', views.CatalogView.as_view(), name='catalog'),
     path('', include(router.urls)),
 ]
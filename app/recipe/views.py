@@ -1,6 +1,13 @@
 """
 Views for Recipes API
 """
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db.models import F, Sum, Value
 
 from drf_spectacular.utils import (
     extend_schema_view,
@@ -15,19 +22,51 @@ from rest_framework import (
     status,
 )
 
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core import jobs
 from core.models import (
+    CatalogName,
     Recipe,
+    RecipeIngredient,
+    RecipeStats,
     Tag,
     Ingredient,
+    Tombstone,
+    Job,
+    VersionConflict,
+    normalize_name,
 )
+from core.storage import PrivateFileSystemStorage
+from core.throttling import RecipeAPIRateThrottle
+from core.uploads import ImageUploadParser
 
 from recipe import serializers
 
+
+class RecipeConflict(APIException):
+    """ 409 for an update based on an outdated version of the recipe """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The recipe was changed since it was read.'
+    default_code = 'conflict'
+
+
+def record_deletion(instance, kind):
+    """ Delete an object and record a tombstone in one transaction """
+    with transaction.atomic():
+        Tombstone.objects.create(
+            user_id=instance.user_id,
+            kind=kind,
+            object_id=instance.pk,
+        )
+        instance.delete()
+
+
 """
 Viewset is setup to work with Model
 decorator extend autogenerated schema created by django spectacular
@@ -47,7 +86,29 @@ extends list endpoint
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma Seperated list of Ids to filter'
-            )
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['-id', 'id', 'price', '-price',
+                      'time_minutes', '-time_minutes'],
+                description='Sort order, newest first by default'
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes'
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much'
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much'
+            ),
         ]
     )
 )
@@ -57,11 +118,38 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [RecipeAPIRateThrottle]
+
+    """
+    Whitelisted ?ordering= values, id breaks ties so the order is stable
+    for keyset pagination and matches the (user, column, id) indexes
+    """
+    ordering_options = {
+        '-id': ['-id'],
+        'id': ['id'],
+        'price': ['price', 'id'],
+        '-price': ['-price', '-id'],
+        'time_minutes': ['time_minutes', 'id'],
+        '-time_minutes': ['-time_minutes', '-id'],
+    }
+    similar_limit = 10
+    stats_top_tags = 5
+    similar_max_limit = 50
 
     def _params_to_ints(self, qs):
         """ Convert a list of strings to integers """
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _param(self, name, convert):
+        """ Return a converted query param, 400 if it is malformed """
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (ValueError, InvalidOperation):
+            raise ValidationError({name: 'Invalid value.'})
+
     """ Override queryset method """
 
     def get_queryset(self):
@@ -79,10 +167,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
+        """ range filters """
+        max_time = self._param('max_time', int)
+        min_price = self._param('min_price', Decimal)
+        max_price = self._param('max_price', Decimal)
+        if max_time is not None:
+            queryset = queryset.filter(time_minutes__lte=max_time)
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        ordering = self.request.query_params.get('ordering', '-id')
+        if ordering not in self.ordering_options:
+            raise ValidationError({'ordering': 'Invalid value.'})
+
+        """ names live in the catalog, fetch them with the links """
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_links()
+
         """ return unique list of recipe results """
         return queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).order_by(*self.ordering_options[ordering]).distinct()
 
     def get_serializer_class(self):
         """ Return the serializer class for request """
@@ -101,22 +208,241 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """ Add current auth user to user """
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        """ Save the update, 409 if the recipe changed since it was read """
+        try:
+            serializer.save()
+        except VersionConflict:
+            raise RecipeConflict()
+
+    def perform_destroy(self, instance):
+        """ Delete recipe, leaving a tombstone for the change feed """
+        record_deletion(instance, Tombstone.RECIPE)
+
     """
     Custom Action, detail means to a specific recipe id,
     if False this would be for a list viewset
     """
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='upload-image',
+        parser_classes=[ImageUploadParser],
+    )
     def upload_image(self, request, pk=None):
         """ Upload an image to recipe"""
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            """ a replaced image is left to gc_media, it may be shared """
+            self.perform_update(serializer)
+            """ rotate and resize in a worker, not in the request """
+            jobs.enqueue(
+                'recipe.process_image',
+                user=request.user,
+                recipe_id=recipe.id,
+                image=recipe.image.name,
+            )
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request=serializers.RecipeDuplicateSerializer,
+        responses={201: serializers.RecipeDetailSerializer(many=True)},
+    )
+    @action(methods=['POST'], detail=True)
+    def duplicate(self, request, pk=None):
+        """ Copy a recipe server side, optionally several times """
+        recipe = self.get_object()
+        serializer = serializers.RecipeDuplicateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        new_ids = Recipe.objects.duplicate(recipe, **serializer.validated_data)
+
+        copies = Recipe.objects.filter(
+            id__in=new_ids,
+        ).with_links().order_by('id')
+        return Response(
+            serializers.RecipeDetailSerializer(
+                copies,
+                many=True,
+                context=self.get_serializer_context(),
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of recipes, 10 by default'
+            ),
+        ],
+        responses=serializers.SimilarRecipeSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """ The user's recipes sharing the most tags and ingredients """
+        recipe = self.get_object()
+        limit = self._param('limit', int)
+        if limit is None:
+            limit = self.similar_limit
+        if not 0 < limit <= self.similar_max_limit:
+            raise ValidationError({'limit': 'Invalid value.'})
+
+        recipes = Recipe.objects.similar_to(recipe).with_links().order_by(
+            '-similarity',
+            '-id',
+        )[:limit]
+
+        serializer = serializers.SimilarRecipeSerializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        request=serializers.RecipeBulkDeleteSerializer,
+        responses={202: serializers.JobSerializer},
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """ Delete many recipes in a background job, in chunks """
+        serializer = serializers.RecipeBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = jobs.enqueue(
+            'recipe.delete',
+            user=request.user,
+            recipe_ids=serializer.validated_data['ids'],
+        )
+
+        return Response(
+            serializers.JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(responses=serializers.RecipeStatsSerializer)
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """ Dashboard statistics, read from the running totals """
+        stats = RecipeStats.objects.filter(user=request.user).first()
+        if stats is None:
+            stats = RecipeStats(user=request.user)
+
+        top_tag_ids = stats.top_tag_ids(self.stats_top_tags)
+        tags = Tag.objects.in_bulk(top_tag_ids)
+        serializer = serializers.RecipeStatsSerializer({
+            'recipe_count': stats.recipe_count,
+            'average_time_minutes': stats.average_time_minutes,
+            'average_price': stats.average_price,
+            'price_distribution': stats.price_distribution(),
+            'top_tags': [
+                {
+                    'id': tag_id,
+                    'name': tags[tag_id].name,
+                    'recipes': stats.tag_counts[str(tag_id)],
+                }
+                for tag_id in top_tag_ids if tag_id in tags
+            ],
+        })
+        return Response(serializer.data)
+
+    @extend_schema(
+        request=serializers.CookableRequestSerializer,
+        responses=serializers.CookableRecipeSerializer(many=True),
+    )
+    @action(methods=['POST'], detail=False)
+    def cookable(self, request):
+        """ Recipes ranked by how many of their ingredients the user has """
+        serializer = serializers.CookableRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        recipes = Recipe.objects.covered_by(params['ingredients']).filter(
+            user=request.user,
+        )
+        if 'max_missing' in params:
+            recipes = recipes.filter(
+                total__lte=F('covered') + params['max_missing'],
+            )
+        recipes = recipes.with_links().order_by(
+            '-covered',
+            'total',
+            '-id',
+        )[:params['limit']]
+
+        return Response(
+            serializers.CookableRecipeSerializer(recipes, many=True).data,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'recipes',
+                OpenApiTypes.STR,
+                required=True,
+                description='Comma Seperated list of recipe Ids to combine'
+            ),
+        ],
+        responses=serializers.ShoppingListItemSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """ Total ingredient amounts across recipes, summed in SQL """
+        recipe_ids = self._param('recipes', self._params_to_ints)
+        if not recipe_ids:
+            raise ValidationError({'recipes': 'This parameter is required.'})
+
+        """ one GROUP BY per ingredient and base unit """
+        items = RecipeIngredient.objects.filter(
+            recipe__user=request.user,
+            recipe_id__in=recipe_ids,
+        ).with_base_units().values(
+            'ingredient_id',
+            'ingredient__catalog__name',
+            'base_unit',
+        ).annotate(
+            quantity=Sum('base_quantity'),
+        ).order_by('ingredient__catalog__name', 'base_unit')
+
+        serializer = serializers.ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        request=serializers.RecipeDetailSerializer(many=True),
+        responses={202: serializers.JobSerializer},
+    )
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        """ Validate recipes now, create them in a background job """
+        serializer = serializers.RecipeDetailSerializer(
+            data=request.data,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        job = jobs.enqueue(
+            'recipe.import',
+            user=request.user,
+            recipes=request.data,
+        )
+
+        return Response(
+            serializers.JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(request=None, responses={202: serializers.JobSerializer})
+    @action(methods=['POST'], detail=False, url_path='export')
+    def export_recipes(self, request):
+        """ Export all recipes to a JSON file in a background job """
+        job = jobs.enqueue('recipe.export', user=request.user)
+
+        return Response(
+            serializers.JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -136,6 +462,7 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
     """ Base viewset for Recipe Attributes """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [RecipeAPIRateThrottle]
 
     def get_queryset(self):
         """ Filter return queryset for only authenticated user """
@@ -148,16 +475,186 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
             queryset = queryset.filter(recipe__isnull=False)
 
         return queryset.filter(
-            user=self.request.user).order_by('-name').distinct()
+            user=self.request.user).order_by('-catalog__name').distinct()
+
+    def perform_update(self, serializer):
+        """ Save attribute, a rename may leave its old name unused """
+        catalog_id = serializer.instance.catalog_id
+        serializer.save()
+        if serializer.instance.catalog_id != catalog_id:
+            CatalogName.objects.prune([catalog_id])
+
+    def perform_destroy(self, instance):
+        """ Delete attribute, leaving a tombstone for the change feed """
+        record_deletion(instance, self.tombstone_kind)
+        CatalogName.objects.prune([instance.catalog_id])
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """ Manage tags in the database """
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    tombstone_kind = Tombstone.TAG
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """ Manage ingredients in the database """
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    tombstone_kind = Tombstone.INGREDIENT
+
+
+class JobViewSet(mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """ Status of the user's background jobs """
+    serializer_class = serializers.JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RecipeAPIRateThrottle]
+
+    def get_queryset(self):
+        """ Retrieve jobs for authenticated user, newest first """
+        return self.queryset.filter(user=self.request.user).order_by('-id')
+
+    @extend_schema(responses={(200, 'application/json'): OpenApiTypes.BINARY})
+    @action(methods=['GET'], detail=True)
+    def download(self, request, pk=None):
+        """ Download the file of a finished export, until it expires """
+        job = self.get_object()
+        result = job.result or {}
+        if (job.name != 'recipe.export' or 'expires_at' not in result
+                or timezone.now() >= parse_datetime(result['expires_at'])):
+            raise Http404
+
+        storage = PrivateFileSystemStorage()
+        if not storage.exists(result['file']):
+            raise Http404
+        return FileResponse(
+            storage.open(result['file'], 'rb'),
+            as_attachment=True,
+            filename=f'recipes-{job.id}.json',
+            content_type='application/json',
+        )
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            'since',
+            OpenApiTypes.STR,
+            description='Token from the previous response, omit to start'
+        ),
+        OpenApiParameter(
+            'limit',
+            OpenApiTypes.INT,
+            description='Maximum number of changes to return'
+        ),
+    ],
+    responses=serializers.ChangesSerializer,
+)
+class ChangesView(APIView):
+    """
+    Changes to the user's recipes, tags and ingredients since a token
+
+    A user's writes take their sequence value under a lock held to commit,
+    see NextChangeSeq, so every committed value is below any still in
+    flight. The page is picked in one statement, one snapshot across all
+    sources, so `next` never skips a change that commits later.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RecipeAPIRateThrottle]
+    default_limit = 100
+    max_limit = 500
+
+    def _int_param(self, name, default):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: 'Invalid value.'})
+        if value < 0:
+            raise ValidationError({name: 'Invalid value.'})
+        return value
+
+    def get(self, request):
+        since = self._int_param('since', 0)
+        limit = min(self._int_param('limit', self.default_limit),
+                    self.max_limit) or self.default_limit
+
+        sources = {
+            'recipes': Recipe.objects.with_links(),
+            'tags': Tag.objects.all(),
+            'ingredients': Ingredient.objects.all(),
+            'deleted': Tombstone.objects.all(),
+        }
+        """ (sequence, source, id) of the page, merged by UNION ALL """
+        keys = [
+            queryset.model.objects.filter(
+                user=request.user,
+                change_seq__gt=since,
+            ).annotate(
+                source=Value(key),
+            ).values_list('change_seq', 'source', 'id')
+            for key, queryset in sources.items()
+        ]
+        changes = list(keys[0].union(*keys[1:], all=True).order_by(
+            'change_seq',
+        )[:limit + 1])
+
+        page = changes[:limit]
+        ids = {key: [] for key in sources}
+        for _, key, pk in page:
+            ids[key].append(pk)
+        """ rows may have changed again since, a later page repeats them """
+        grouped = {
+            key: sorted(
+                queryset.filter(pk__in=ids[key]),
+                key=lambda row: row.change_seq,
+            ) if ids[key] else []
+            for key, queryset in sources.items()
+        }
+
+        serializer = serializers.ChangesSerializer({
+            **grouped,
+            'next': str(page[-1][0] if page else since),
+            'has_more': len(changes) > limit,
+        })
+        return Response(serializer.data)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            'q',
+            OpenApiTypes.STR,
+            required=True,
+            description='Start of a tag or ingredient name'
+        ),
+    ],
+    responses=serializers.CatalogNameSerializer(many=True),
+)
+class CatalogView(APIView):
+    """ Autocomplete tag and ingredient names from the shared catalog """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RecipeAPIRateThrottle]
+    limit = 10
+    """ names nobody else has are only suggested to their own users """
+    min_users = 3
+
+    def get(self, request):
+        prefix = normalize_name(request.query_params.get('q', ''))
+        if not prefix:
+            raise ValidationError({'q': 'This parameter is required.'})
+
+        names = CatalogName.objects.suggest(
+            request.user,
+            prefix,
+            limit=self.limit,
+            min_users=self.min_users,
+        )
+
+        serializer = serializers.CatalogNameSerializer(names, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,22 @@
+"""
+Background jobs for users
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core import deletion
+from core.jobs import heartbeat, job, schedule
+
+
+@job('user.delete')
+def delete_user(job):
+    """ Delete a deactivated user and everything they own """
+    user = get_user_model().objects.filter(pk=job.payload['user_id']).first()
+    if user is None:
+        return {'skipped': True}
+
+    deleted = deletion.delete_user(user, on_chunk=lambda: heartbeat(job))
+    """ their images are orphans now """
+    schedule('media.gc', settings.MEDIA_GC_DELAY)
+
+    return deleted
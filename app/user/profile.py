@@ -0,0 +1,59 @@
+"""
+Cached profiles for the me endpoint
+
+The serialized profile of each user is kept in the shared cache for
+USER_PROFILE_CACHE_SECONDS, keyed by a per-user generation. Committing a
+save or delete of the user bumps the generation, see user/signals.py, so
+writes through the ORM are seen by the next read. A read that misses
+takes the generation before it re-reads the user, a profile built from a
+row a concurrent write replaced lands under a generation nobody asks
+for again.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_PREFIX = 'profile'
+
+
+def generation_key(user_id):
+    return f'{CACHE_PREFIX}:generation:{user_id}'
+
+
+def cache_key(user_id, generation):
+    return f'{CACHE_PREFIX}:{user_id}:{generation}'
+
+
+def generation(user_id):
+    """
+    The user's current generation, started from the clock when missing so
+    an evicted counter never comes back at a value it had before
+    """
+    key = generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), settings.USER_PROFILE_CACHE_SECONDS)
+        value = cache.get(key)
+    return value
+
+
+def get(user, serialize):
+    """ The cached profile of `user`, built with `serialize` on a miss """
+    key = cache_key(user.pk, generation(user.pk))
+    data = cache.get(key)
+    if data is None:
+        """ the request's user may predate a write that bumped the key """
+        user.refresh_from_db()
+        data = dict(serialize(user))
+        cache.set(key, data, settings.USER_PROFILE_CACHE_SECONDS)
+    return data
+
+
+def invalidate(user_id):
+    """ Move the user to a new generation, older entries expire unread """
+    try:
+        cache.incr(generation_key(user_id))
+    except ValueError:
+        """ no counter, the next read starts a new one """
+        pass
@@ -27,15 +27,23 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
-        """ Update and return user """
+        """ Update and return user, writing the changed columns once """
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed:
+            setattr(instance, attr, validated_data[attr])
 
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            changed.append('password')
 
-        return user
+        if changed:
+            instance.save(update_fields=changed)
+
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -0,0 +1,20 @@
+"""
+Signal handlers for users
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user import profile
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_profile(sender, instance, **kwargs):
+    """
+    Drop the cached profile whenever the user row changes, once the change
+    is visible to the reads that rebuild it
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: profile.invalidate(pk))
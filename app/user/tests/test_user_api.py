@@ -2,10 +2,19 @@
 Tests for User API
 """
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core import jobs
+from core.models import Job, Recipe
+from core.tests.factories import create_recipe, create_user
+from user import profile
+
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
@@ -14,14 +23,6 @@ CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
 
-""" Helper Function """
-
-
-def create_user(**params):
-    """ Create return new user """
-    return get_user_model().objects.create_user(**params)
-
-
 """ Public Tests - don't require authentication """
 
 
@@ -130,15 +131,18 @@ class PublicUserApiTests(TestCase):
 class PrivateUserApiTests(TestCase):
     """ Test API requests that require authentication """
 
-    def setUp(self):
-        self.user = create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
             email='test@example.com',
             password='Password123!',
             name='Test User'
         )
 
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        cache.clear()
 
     def test_retrieve_profile_success(self):
         """ Test retrieving profile for logged in user """
@@ -149,6 +153,48 @@ class PrivateUserApiTests(TestCase):
             'email': self.user.email,
         })
 
+    def test_retrieve_profile_cached(self):
+        """ Test the profile is served from the cache until a save """
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Changed Without Signals',
+        )
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'Test User')
+
+        self.user.name = 'Saved Name'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['name'])
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'Saved Name')
+
+    def test_retrieve_profile_not_recached_stale(self):
+        """ Test a read holding a user older than a save caches the save """
+        stale = get_user_model().objects.get(pk=self.user.pk)
+        self.client.get(ME_URL)
+
+        self.user.name = 'Saved Name'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['name'])
+        data = profile.get(stale, lambda user: {'name': user.name})
+
+        self.assertEqual(data['name'], 'Saved Name')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.data['name'], 'Saved Name')
+
+    def test_profile_generation_survives_eviction(self):
+        """ Test a lost generation counter never reuses an old entry """
+        self.client.get(ME_URL)
+        cache.delete(profile.generation_key(self.user.pk))
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Changed Without Signals',
+        )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Changed Without Signals')
+
     def test_post_me_not_allowed(self):
         """ Test POST is not allowed for the me endpoint """
         res = self.client.post(ME_URL, {})
@@ -168,3 +214,42 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_user_profile_single_write(self):
+        """ Test an update writes only the changed columns, once """
+        payload = {'name': 'Updated Name', 'password': 'NewPassword123!'}
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(ME_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        updates = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"name"', updates[0])
+        self.assertIn('"password"', updates[0])
+        self.assertNotIn('"email"', updates[0])
+
+    def test_delete_account(self):
+        """ Test deleting locks the account, a job removes the data """
+        create_recipe(user=self.user)
+        Token.objects.create(user=self.user)
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+        jobs.run_pending()
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertTrue(Job.objects.filter(
+            name='media.gc',
+            status=Job.QUEUED,
+        ).exists())
@@ -2,10 +2,19 @@
 Views for user API
 """
 
-from rest_framework import generics, authentication, permissions
+from django.db import transaction
+
+from drf_spectacular.utils import extend_schema
+
+from rest_framework import generics, authentication, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import jobs
+from core.throttling import TokenRateThrottle
+from user import profile
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -20,11 +29,12 @@ class CreateUserView(generics.CreateAPIView):
 class CreateTokenView(ObtainAuthToken):
     """ Create new auth token for user """
     serializer_class = AuthTokenSerializer
+    throttle_classes = [TokenRateThrottle]
     # Make API viewable in Browser
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """ Manage the authenticated user """
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
@@ -34,3 +44,23 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """ Retrieve and return the authenticated user """
         return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        """ Serve the profile from the cache, saving the user drops it """
+        return Response(profile.get(
+            self.get_object(),
+            lambda user: self.get_serializer(user).data,
+        ))
+
+    @extend_schema(responses={202: None})
+    def destroy(self, request, *args, **kwargs):
+        """ Lock the account now, delete its data in a background job """
+        user = self.get_object()
+        with transaction.atomic():
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            Token.objects.filter(user=user).delete()
+            """ not owned by the user, the job outlives the user row """
+            jobs.enqueue('user.delete', user_id=user.pk)
+
+        return Response(status=status.HTTP_202_ACCEPTED)
@@ -1,8 +1,49 @@
 server {
   listen ${LISTEN_PORT};
 
-  location /static {
-    alias /vol/static;
+  sendfile              on;
+  tcp_nopush            on;
+  open_file_cache       max=2000 inactive=60s;
+  open_file_cache_valid 60s;
+
+  # compress API responses on the fly, bodies under 1KB are not worth it;
+  # level 5 is close to level 9 in size at a fraction of the CPU, see
+  # app/benchmarks/compression.py
+  gzip              on;
+  gzip_comp_level   5;
+  gzip_min_length   1024;
+  gzip_proxied      any;
+  gzip_vary         on;
+  gzip_types        application/json
+                    application/vnd.oai.openapi
+                    application/vnd.oai.openapi+json
+                    application/yaml
+                    text/css
+                    application/javascript
+                    image/svg+xml;
+
+  # /static/... maps onto the /vol/static volume
+
+  # collectstatic output with a content hash in the name never changes,
+  # serve the precompressed .gz written next to it when accepted
+  location ~ "^/static/static/.+\.[0-9a-f]{12}\.\w+$" {
+    root        /vol;
+    gzip_static on;
+    add_header  Cache-Control "public, max-age=31536000, immutable";
+    access_log  off;
+  }
+
+  location /static/static/ {
+    root        /vol;
+    gzip_static on;
+    expires     1h;
+  }
+
+  # uploaded images get a unique name per upload
+  location /static/media/ {
+    root        /vol;
+    add_header  Cache-Control "public, max-age=31536000, immutable";
+    access_log  off;
   }
 
   location / {
@@ -10,4 +51,4 @@ server {
     include                 /etc/nginx/uwsgi_params;
     client_max_body_size    10M;
   }
-}
\ No newline at end of file
+}
@@ -2,8 +2,7 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+python manage.py bootstrap
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+. /scripts/uwsgi-profile.sh
+exec uwsgi --ini /scripts/uwsgi.ini
@@ -0,0 +1,31 @@
+#!/bin/sh
+# Derive the uWSGI serving profile, sourced by run.sh.
+#
+# SERVE_PROFILE picks a preset sized from the CPU count:
+#   small       memory constrained hosts, fixed 2 workers
+#   balanced    default, 2 workers per CPU
+#   throughput  more workers and threads for IO-heavy traffic
+# Any SERVE_* variable already set in the environment wins.
+
+CPUS=$(nproc 2>/dev/null || echo 1)
+
+case "${SERVE_PROFILE:-balanced}" in
+  small)
+    workers=2 threads=2 max_requests=2000 reload_on_rss=128 listen=128 ;;
+  balanced)
+    workers=$((CPUS * 2)) threads=2 max_requests=5000 reload_on_rss=256 \
+      listen=256 ;;
+  throughput)
+    workers=$((CPUS * 2 + 1)) threads=4 max_requests=10000 \
+      reload_on_rss=384 listen=1024 ;;
+  *)
+    echo "Unknown SERVE_PROFILE '${SERVE_PROFILE}'" >&2
+    exit 1 ;;
+esac
+
+export SERVE_SOCKET="${SERVE_SOCKET:-:9000}"
+export SERVE_WORKERS="${SERVE_WORKERS:-$workers}"
+export SERVE_THREADS="${SERVE_THREADS:-$threads}"
+export SERVE_MAX_REQUESTS="${SERVE_MAX_REQUESTS:-$max_requests}"
+export SERVE_RELOAD_ON_RSS="${SERVE_RELOAD_ON_RSS:-$reload_on_rss}"
+export SERVE_LISTEN="${SERVE_LISTEN:-$listen}"